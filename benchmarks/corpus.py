@@ -0,0 +1,237 @@
+import html
+import random
+import zlib
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import quoteattr
+
+import config.custom_fields_to_use
+
+# Danish and English words, roughly what the JAR issues are written in
+WORDS = (
+    'the', 'and', 'to', 'of', 'is', 'in', 'for', 'not', 'when', 'with', 'error', 'user', 'field', 'report',
+    'release', 'version', 'page', 'button', 'data', 'import', 'export', 'fejl', 'og', 'ikke', 'det', 'skal',
+    'kan', 'ved', 'bruger', 'side', 'felt', 'rapport', 'opdatering', 'visning', 'gemme', 'kommune', 'sag',
+)
+PRIORITIES = ('Highest', 'High', 'Medium', 'Low', 'Lowest')
+STATUSES = ('Open', 'Closed', 'Resolved', 'Reopened', 'On Hold')
+ISSUE_TYPES = ('Bug', 'Task', 'Story', 'Improvement')
+LABELS = ('4.0', '4.01', '4.1', '4.2', '4.7', '4.12', 'UdenforRelease', 'Uafklaret')
+PEOPLE = ('Emil Sahin', 'Filip Bruman', 'Line Boel', 'Peter Riis', 'Tina Rebsdorf Simonsen', 'Tom Birch Hansen')
+
+# Number of issues and (min, max) ranges for description blocks, comments per issue and blocks per comment
+SIZES = {
+    'small': {'issues': 20, 'paragraphs': (1, 6), 'comments': (0, 4), 'comment_paragraphs': (1, 3)},
+    'medium': {'issues': 100, 'paragraphs': (2, 20), 'comments': (0, 15), 'comment_paragraphs': (1, 6)},
+    'large': {'issues': 200, 'paragraphs': (10, 120), 'comments': (5, 60), 'comment_paragraphs': (1, 12)},
+}
+
+
+class CorpusGenerator:
+    """Seeded generator of Jira issues shaped like the ones we migrate.
+
+    Produces REST v3 issues (fields, ADF description, custom fields and the
+    embedded comment thread) together with the matching issue XML, whose
+    comments reference the same images and files as the ADF media nodes.
+    The same seed and size always give the same corpus.
+    """
+
+    def __init__(self, seed=1, size='medium', base_url='https://jira.example.com'):
+        self.random = random.Random(seed)
+        self.shape = SIZES[size]
+        self.base_url = base_url
+        self.next_id = 10000
+
+    def _id(self) -> str:
+        self.next_id += 1
+        return str(self.next_id)
+
+    def _words(self, low=3, high=14) -> str:
+        return ' '.join(self.random.choice(WORDS) for _ in range(self.random.randint(low, high)))
+
+    def _timestamp(self) -> str:
+        moment = datetime(2020, 1, 1, tzinfo=timezone(timedelta(hours=1))) + timedelta(
+            minutes=self.random.randint(0, 5 * 365 * 24 * 60))
+        return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f'{moment.microsecond // 1000:03d}+0100'
+
+    def _person(self, name=None) -> dict:
+        name = name or self.random.choice(PEOPLE)
+        return {'displayName': name, 'self': f'{self.base_url}/rest/api/3/user?accountId={zlib.crc32(name.encode())}'}
+
+    # ADF
+
+    def _text(self) -> dict:
+        node = {'type': 'text', 'text': self._words() + ' '}
+        roll = self.random.random()
+        if roll < 0.08:
+            node['marks'] = [{'type': 'strong'}]
+        elif roll < 0.12:
+            node['marks'] = [{'type': 'em'}]
+        elif roll < 0.16:
+            node['marks'] = [{'type': 'link', 'attrs': {'href': f'{self.base_url}/browse/JAR-{self.random.randint(1, 3000)}'}}]
+        elif roll < 0.17:
+            node['marks'] = [{'type': 'code'}]
+        return node
+
+    def _inlines(self) -> list[dict]:
+        nodes = []
+        for _ in range(self.random.randint(1, 5)):
+            roll = self.random.random()
+            if roll < 0.04:
+                nodes.append({'type': 'hardBreak'})
+            elif roll < 0.06:
+                nodes.append({'type': 'mention', 'attrs': {'text': '@' + self.random.choice(PEOPLE)}})
+            elif roll < 0.08:
+                nodes.append({'type': 'inlineCard', 'attrs': {'url': f'{self.base_url}/browse/JAR-{self.random.randint(1, 3000)}'}})
+            else:
+                nodes.append(self._text())
+        return nodes
+
+    def _paragraph(self) -> dict:
+        return {'type': 'paragraph', 'content': self._inlines()}
+
+    def _list(self, depth=0) -> dict:
+        kind = self.random.choice(('bulletList', 'orderedList'))
+        items = []
+        for _ in range(self.random.randint(2, 6)):
+            content = [self._paragraph()]
+            if depth < 2 and self.random.random() < 0.15:
+                content.append(self._list(depth + 1))
+            items.append({'type': 'listItem', 'content': content})
+        node = {'type': kind, 'content': items}
+        if kind == 'orderedList':
+            node['attrs'] = {'order': 1}
+        return node
+
+    def _table(self) -> dict:
+        columns = self.random.randint(2, 5)
+        rows = []
+        for row in range(self.random.randint(2, 8)):
+            cell_type = 'tableHeader' if row == 0 else 'tableCell'
+            rows.append({'type': 'tableRow', 'content': [
+                {'type': cell_type, 'content': [{'type': 'paragraph', 'content': [{'type': 'text', 'text': self._words(1, 4)}]}]}
+                for _ in range(columns)]})
+        return {'type': 'table', 'content': rows}
+
+    def _code_block(self) -> dict:
+        lines = '\n'.join(f'{self._words(1, 3).replace(" ", "_")} = {self.random.randint(0, 99)}'
+                          for _ in range(self.random.randint(2, 12)))
+        return {'type': 'codeBlock', 'attrs': {'language': 'python'}, 'content': [{'type': 'text', 'text': lines}]}
+
+    def _blocks(self, count, media=None) -> list[dict]:
+        blocks = []
+        for _ in range(count):
+            roll = self.random.random()
+            if roll < 0.62:
+                blocks.append(self._paragraph())
+            elif roll < 0.77:
+                blocks.append(self._list())
+            elif roll < 0.82:
+                blocks.append({'type': 'heading', 'attrs': {'level': self.random.randint(1, 3)},
+                               'content': [{'type': 'text', 'text': self._words(1, 5)}]})
+            elif roll < 0.86:
+                blocks.append(self._code_block())
+            elif roll < 0.89:
+                blocks.append(self._table())
+            elif roll < 0.92:
+                blocks.append({'type': 'blockquote', 'content': [self._paragraph()]})
+            elif roll < 0.93:
+                blocks.append({'type': 'rule'})
+            elif media is not None:
+                # An image or file, also referenced from the comment HTML in the XML
+                kind = 'image' if self.random.random() < 0.7 else 'file'
+                media.append((kind, self._id(), f'{self._words(1, 2).replace(" ", "_")}.{"png" if kind == "image" else "pdf"}'))
+                blocks.append({'type': 'mediaSingle', 'content': [{'type': 'media', 'attrs': {'id': media[-1][1], 'type': 'file'}}]})
+            else:
+                blocks.append(self._paragraph())
+        return blocks
+
+    def adf_document(self, low, high, media=None) -> dict:
+        return {'type': 'doc', 'version': 1, 'content': self._blocks(self.random.randint(low, high), media)}
+
+    # Issues
+
+    def _comment(self) -> tuple[dict, list]:
+        media = []
+        comment = {
+            'id': self._id(),
+            'author': self._person(),
+            'body': self.adf_document(*self.shape['comment_paragraphs'], media=media),
+            'created': self._timestamp(),
+        }
+        return comment, media
+
+    def _custom_fields(self) -> dict:
+        fields = {}
+        for field_id in config.custom_fields_to_use.fields:
+            roll = self.random.random()
+            if roll < 0.3:
+                fields[field_id] = None
+            elif roll < 0.5:
+                fields[field_id] = self._person()
+            elif roll < 0.7:
+                fields[field_id] = {'type': 'doc', 'version': 1, 'content': [self._paragraph()]}
+            else:
+                fields[field_id] = self._words(1, 4)
+        return fields
+
+    def issue(self, number) -> tuple[dict, list]:
+        """Return a REST v3 issue and the media referenced by its comments, per comment."""
+        comments, media = [], []
+        for _ in range(self.random.randint(*self.shape['comments'])):
+            comment, comment_media = self._comment()
+            comments.append(comment)
+            media.append(comment_media)
+
+        fields = {
+            'summary': self._words(3, 10),
+            'description': self.adf_document(*self.shape['paragraphs']),
+            'reporter': self._person(),
+            'assignee': self._person() if self.random.random() < 0.8 else None,
+            'created': self._timestamp(),
+            'updated': self._timestamp(),
+            'labels': self.random.sample(LABELS, self.random.randint(0, 3)),
+            'priority': {'name': self.random.choice(PRIORITIES)},
+            'status': {'name': self.random.choice(STATUSES)},
+            'issuetype': {'name': self.random.choice(ISSUE_TYPES)},
+            'attachment': [],
+            'issuelinks': [],
+            'comment': {'comments': comments, 'total': len(comments), 'maxResults': len(comments), 'startAt': 0},
+        }
+        fields.update(self._custom_fields())
+        return {'key': f'JAR-{number}', 'fields': fields}, media
+
+    def issue_xml(self, issue, media) -> str:
+        """Return the ``<item>`` XML of *issue*, as split by ``endpoint.jira.fetch_jira_issues_xml``."""
+        attachments = []
+        comments = []
+        for comment, comment_media in zip(issue['fields']['comment']['comments'], media):
+            parts = [f'<p>{html.escape(self._words())}</p>']
+            for kind, attachment_id, name in comment_media:
+                url = f'{self.base_url}/secure/attachment/content/{attachment_id}'
+                attachments.append(f'<attachment id="{attachment_id}" name={quoteattr(name)} size="1024"/>')
+                if kind == 'image':
+                    parts.append(f'<p><span class="image-wrap"><img src="{url}" /></span></p>')
+                else:
+                    parts.append(f'<p><a href="{url}" data-attachment-type="file" data-attachment-name={quoteattr(name)}>{html.escape(name)}</a></p>')
+            if self.random.random() < 0.1:
+                cells = ''.join(f'<td>{html.escape(self._words(1, 3))}</td>' for _ in range(3))
+                parts.append(f'<table><tr><th>a</th><th>b</th><th>c</th></tr><tr>{cells}</tr></table>')
+            comments.append(
+                f'<comment id="{comment["id"]}" author="{zlib.crc32(comment["author"]["displayName"].encode())}" '
+                f'created="{comment["created"]}">{html.escape("".join(parts))}</comment>')
+
+        return (
+            f'<item><title>[{issue["key"]}] {html.escape(issue["fields"]["summary"])}</title>'
+            f'<key>{issue["key"]}</key>'
+            f'<description>{html.escape(self._words(5, 40))}</description>'
+            f'<comments>{"".join(comments)}</comments>'
+            f'<attachments>{"".join(attachments)}</attachments></item>'
+        )
+
+    def corpus(self) -> list[tuple[dict, str]]:
+        """Return ``(issue, issue_xml)`` for every issue of the configured size."""
+        result = []
+        for number in range(1, self.shape['issues'] + 1):
+            issue, media = self.issue(number)
+            result.append((issue, self.issue_xml(issue, media)))
+        return result
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import config.custom_fields_to_use
+import parser.jira
+from transformer import date_time_helper
+from benchmarks.corpus import SIZES, CorpusGenerator
+
+
+def build_cases(corpus):
+    """Return name -> (function, list of argument tuples) for every benchmarked parser function."""
+    custom_fields = {field_id: f'Field {field_id[-5:]}' for field_id in config.custom_fields_to_use.fields}
+
+    comments = []
+    for issue, issue_xml in corpus:
+        records = parser.jira.parse_jira_comments_xml(issue_xml)
+        comments.extend((comment, records.get(comment['id'])) for comment in issue['fields']['comment']['comments'])
+
+    timestamps = [issue['fields']['created'] for issue, _ in corpus]
+    timestamps += [comment['created'] for comment, _ in comments]
+
+    return {
+        'parse_jira_description': (
+            parser.jira.parse_jira_description, [(issue['fields']['description'],) for issue, _ in corpus]),
+        'format_jira_comment': (parser.jira.format_jira_comment, comments),
+        'parse_jira_comments_xml': (parser.jira.parse_jira_comments_xml, [(issue_xml,) for _, issue_xml in corpus]),
+        'filter_custom_fields': (
+            parser.jira.filter_custom_fields, [(issue['fields'], custom_fields) for issue, _ in corpus]),
+        'convert_jira_to_github_datetime_format': (
+            date_time_helper.convert_jira_to_github_datetime_format, [(timestamp,) for timestamp in timestamps]),
+    }
+
+
+def measure(function, calls, repeat=5):
+    """Time *repeat* passes over *calls*, then trace the memory of one more pass."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for args in calls:
+            function(*args)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    for args in calls:
+        function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        'calls': len(calls),
+        'best_s': best,
+        'median_s': statistics.median(timings),
+        'per_call_us': best / len(calls) * 1e6 if calls else 0.0,
+        'peak_kib': peak / 1024,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    print(f"{'function':42s} {'baseline':>12s} {'current':>12s} {'speedup':>8s}")
+    for name, result in results['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        speedup = before['per_call_us'] / result['per_call_us'] if result['per_call_us'] else float('inf')
+        print(f"{name:42s} {before['per_call_us']:10.1f}us {result['per_call_us']:10.1f}us {speedup:7.2f}x")
+
+
+def main(argv=None):
+    argument_parser = argparse.ArgumentParser(description="Time and memory-profile the Jira parsers on a synthetic corpus.")
+    argument_parser.add_argument('--size', choices=sorted(SIZES), default='medium', help="corpus size")
+    argument_parser.add_argument('--seed', type=int, default=1, help="corpus seed, the same seed gives the same corpus")
+    argument_parser.add_argument('--repeat', type=int, default=5, help="timed passes per function, the best one counts")
+    argument_parser.add_argument('--only', action='append', help="only run this function (can be repeated)")
+    argument_parser.add_argument('--output', default='benchmarks/results/latest.json', help="JSON file for the results")
+    argument_parser.add_argument('--compare', help="earlier results JSON to compare with")
+    args = argument_parser.parse_args(argv)
+
+    corpus = CorpusGenerator(args.seed, args.size).corpus()
+    cases = build_cases(corpus)
+
+    results = {
+        'meta': {
+            'size': args.size,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'issues': len(corpus),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        },
+        'results': {},
+    }
+    for name, (function, calls) in cases.items():
+        if args.only and name not in args.only:
+            continue
+        result = measure(function, calls, args.repeat)
+        results['results'][name] = result
+        print(f"{name:42s} {result['calls']:6d} calls {result['per_call_us']:10.1f}us/call "
+              f"{result['peak_kib']:10.1f} KiB peak", file=sys.stderr)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.run --size large --output before.json
+    # python -m benchmarks.run --size large --output after.json --compare before.json
+    main()
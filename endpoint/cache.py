@@ -0,0 +1,123 @@
+import gzip
+import json
+import logging
+import os
+import threading
+
+_jira_cache = None
+_jira_cache_lock = threading.Lock()
+
+
+class ResponseCache:
+    """Compressed on-disk cache of responses for a single Jira issue.
+
+    Entries are stored per kind (``issue``, ``comments``, ``xml``) and issue
+    key, together with the ``updated`` timestamp of the issue they were
+    fetched for. An entry is only returned when that timestamp still
+    matches, so issues that changed in Jira are fetched again. The same
+    goes for *variant*, e.g. a hash of the requested fields, so a change in
+    what is requested does not serve entries that lack it.
+
+    When the files on disk grow beyond *max_bytes* the least recently used
+    entries are removed.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # path -> size of every entry on disk, used for eviction
+        self.sizes: dict[str, int] = {}
+        for root, _, files in os.walk(cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                self.sizes[path] = os.path.getsize(path)
+        self.total_size = sum(self.sizes.values())
+
+    def _path(self, kind: str, issue_key: str) -> str:
+        return os.path.join(self.cache_dir, kind, f'{issue_key}.json.gz')
+
+    def get(self, kind: str, issue_key: str, updated: str | None, variant: str | None = None):
+        """Return the cached value, or ``None`` when missing or out of date."""
+        path = self._path(kind, issue_key)
+        if updated is None or path not in self.sizes:
+            self.misses += 1
+            return None
+
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            # Evicted by another thread in the meantime
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            self.misses += 1
+            return None
+
+        if entry.get('updated') != updated or entry.get('variant') != variant:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry['value']
+
+    def put(self, kind: str, issue_key: str, updated: str | None, value, variant: str | None = None) -> None:
+        """Store *value* for *issue_key* as it was at *updated* (and requested as *variant*)."""
+        if updated is None:
+            return
+
+        path = self._path(kind, issue_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump({'updated': updated, 'variant': variant, 'value': value}, f)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.total_size += os.path.getsize(path) - self.sizes.get(path, 0)
+            self.sizes[path] = os.path.getsize(path)
+            if self.total_size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Remove the least recently used entries until we are at 90% of the limit
+        def last_used(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+
+        target = self.max_bytes * 0.9
+        for path in sorted(self.sizes, key=last_used):
+            if self.total_size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.total_size -= self.sizes.pop(path)
+
+
+def get_jira_cache() -> ResponseCache | None:
+    """Return the shared Jira response cache, or ``None`` when it is disabled.
+
+    Configured with ``JIRA_CACHE_DIR`` (set it to an empty value to disable
+    the cache) and ``JIRA_CACHE_MAX_MB``.
+    """
+    global _jira_cache
+
+    cache_dir = os.getenv('JIRA_CACHE_DIR', '.cache/jira')
+    if not cache_dir:
+        return None
+
+    with _jira_cache_lock:
+        if _jira_cache is None:
+            max_bytes = int(float(os.getenv('JIRA_CACHE_MAX_MB', 1024)) * 1024 * 1024)
+            _jira_cache = ResponseCache(cache_dir, max_bytes)
+    return _jira_cache
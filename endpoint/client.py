@@ -0,0 +1,55 @@
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+class _PooledSession(requests.Session):
+    """Session that applies a default timeout to every request."""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _new_session() -> requests.Session:
+    # Read here rather than at import so values from .env are picked up
+    pool_size = int(os.getenv('HTTP_POOL_SIZE', 10))
+    connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', 10))
+    read_timeout = float(os.getenv('HTTP_READ_TIMEOUT', 60))
+
+    session = _PooledSession(timeout=(connect_timeout, read_timeout))
+    session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the shared session for the host of *url*.
+
+    One session is kept per host, so connections (and their TLS handshake)
+    are reused across calls and across threads. Authentication is passed
+    per request, the session itself holds no credentials.
+    """
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _sessions[host] = _new_session()
+    return session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Send a request through the pooled session of the host of *url*."""
+    return get_session(url).request(method, url, **kwargs)
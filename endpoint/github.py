@@ -1,80 +1,223 @@
 import time
 import logging
-import requests
-from datetime import datetime, timedelta
+import re
+import threading
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import traceback
 
-import endpoint.github
+import endpoint.client
+
+class TokenBucket:
+    """Token bucket for one GitHub rate limit resource.
+
+    Refills continuously at ``rate`` tokens per second up to ``capacity``.
+    ``sync`` updates it from the ``X-RateLimit-*`` headers of a response:
+    the bucket never holds more tokens than GitHub says remain, and the
+    refill rate becomes whatever spreads the remaining budget over the time
+    left until the reset. Safe to share between threads.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.reset_at = 0  # epoch seconds of the current GitHub window
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if self.rate > 0:
+                    wait_time = (1 - self.tokens) / self.rate
+                else:
+                    # Budget is spent, the next tokens arrive with the reset
+                    wait_time = max(self.reset_at - time.time(), 0) + 1
+                    self.tokens = 0
+                    self.rate = self.capacity / max(wait_time, 1)
+            if wait_time > 5:
+                logging.warning(f"Rate limit exhausted. Waiting {wait_time:.0f} seconds...")
+            time.sleep(wait_time)
+
+    def sync(self, limit, remaining, reset_at):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.capacity = limit
+            if reset_at > self.reset_at:
+                # A new window started, GitHub handed out a fresh budget
+                self.tokens = float(remaining)
+                self.reset_at = reset_at
+            elif reset_at == self.reset_at:
+                # Responses can arrive out of order, the lowest count is the latest
+                self.tokens = min(self.tokens, float(remaining))
+            else:
+                return
+            self.rate = remaining / max(self.reset_at - time.time(), 1)
 
-last_request_time = 0  # Tracks the last request time
 
 class GithubRateLimiter:
-    def __init__(self, max_requests=30, time_window=60):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = []
-    
-    def wait_if_needed(self):
-        now = datetime.now()
-        self.requests = [req_time for req_time in self.requests 
-                        if (now - req_time).total_seconds() < self.time_window]
-        
-        if len(self.requests) >= self.max_requests:
-            # Wait until oldest request expires
-            sleep_time = self.time_window - (now - self.requests[0]).total_seconds()
-            if sleep_time > 0:
-                time.sleep(sleep_time + 1)  # Add 1 second buffer
-            self.requests = self.requests[1:]
-        
-        self.requests.append(now)
+    """Separate token buckets for the GitHub rate limit resources.
+
+    ``core`` and ``graphql`` start from GitHub's documented hourly budgets
+    and are corrected by the headers of every response. The import API has
+    no headers of its own, its bucket allows GitHub's documented 80 content
+    creating requests per minute and those also count against ``core``.
+    """
+
+    def __init__(self):
+        self.buckets = {
+            'core': TokenBucket(5000, 5000 / 3600),
+            'graphql': TokenBucket(5000, 5000 / 3600),
+            'search': TokenBucket(30, 30 / 60),
+            'import': TokenBucket(80, 80 / 60),
+        }
+
+    @staticmethod
+    def resources_for(method, url):
+        if url.endswith('/graphql'):
+            return ['graphql']
+        if '/search/' in url:
+            return ['search']
+        if method == 'POST' and url.endswith('/import/issues'):
+            return ['import', 'core']
+        return ['core']
+
+    def wait_if_needed(self, method, url):
+        for resource in self.resources_for(method, url):
+            self.buckets[resource].acquire()
+
+    def update(self, response):
+        resource = response.headers.get('X-RateLimit-Resource')
+        if resource not in self.buckets:
+            return
+        try:
+            limit = int(response.headers['X-RateLimit-Limit'])
+            remaining = int(response.headers['X-RateLimit-Remaining'])
+            reset_at = int(response.headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        self.buckets[resource].sync(limit, remaining, reset_at)
 
 github_limiter = GithubRateLimiter()
 
+
+class WriteConcurrencyController:
+    """AIMD controller for the number of write requests in flight.
+
+    GitHub's secondary rate limits punish too many concurrent content
+    creating requests. The window starts at one request and grows by one
+    for every window's worth of clean responses (additive increase). A
+    secondary rate limit response halves it (multiplicative decrease) and
+    pauses every writer for the time GitHub asks for.
+
+    ``current_window`` exposes the current limit.
+    """
+
+    def __init__(self, initial=1, minimum=1, maximum=8):
+        self.window = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    @property
+    def current_window(self) -> int:
+        return int(self.window)
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait_time = self.paused_until - time.monotonic()
+                if wait_time > 0:
+                    self.condition.wait(wait_time)
+                elif self.in_flight >= int(self.window):
+                    self.condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self.condition:
+            self.in_flight -= 1
+            previous = int(self.window)
+            if throttled:
+                self.window = max(self.minimum, self.window / 2)
+            else:
+                self.window = min(self.maximum, self.window + 1 / self.window)
+            if int(self.window) != previous:
+                logging.info(f"GitHub write window is now {int(self.window)}")
+            self.condition.notify_all()
+
+    def pause(self, seconds):
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.condition.notify_all()
+
+
+github_write_controller = WriteConcurrencyController()
+
+def _is_write_request(method, url, json=None) -> bool:
+    # Every GraphQL call is a POST, only mutations write
+    if url.endswith('/graphql'):
+        query = (json or {}).get('query', '')
+        return query.lstrip().startswith('mutation')
+    return method in ('POST', 'PATCH', 'PUT', 'DELETE')
+
 def make_github_request(method, url, headers, params=None, json=None, max_retries=3):
-    global last_request_time  # Use global variable to track last request time
-    github_limiter.wait_if_needed()
-
-    # Determine if the request is a POST, PATCH, PUT, or DELETE
-    if method in (requests.post, requests.patch, requests.put, requests.delete):
-        current_time = time.time()
-        time_since_last_request = current_time - last_request_time
-        if time_since_last_request < 1:
-            wait_time = max(0.5 - time_since_last_request, 0.0)
-            logging.info(f"Waiting {wait_time:.0f} seconds to avoid hitting secondary rate limits...")
-            time.sleep(wait_time)
+    # Only writes (REST POST, PATCH, PUT, DELETE and GraphQL mutations) take a slot in the write window
+    is_write = _is_write_request(method, url, json)
 
     for attempt in range(max_retries):
-        response = method(url, headers=headers, params=params, json=json)
-        last_request_time = time.time()  # Update last request time after making the request
-
-        remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
-        reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-
-        if response.status_code in (429, 403):
-            error_data = response.json()
-            request_id = error_data.get('message', '').split('request ID ')[-1].split()[0]
-            logging.warning(f"Rate limit exceeded. Request ID: {request_id}")
-
-            if 'secondary rate limit' in error_data.get('message', ''):
-                if response.status_code == 429 or response.status_code == 403:
-                    retry_after = response.headers.get('Retry-After')
-                    if retry_after:
-                        wait_time = int(retry_after)
-                    else:
-                        wait_time = max(reset_time - time.time(), 60)
-                    logging.warning(f"Secondary rate limit hit. Waiting {wait_time:.0f} seconds...")
-                    time.sleep(wait_time)
-                else: 
-                    wait_time = min(300, 30 * (2 ** attempt))
-                    logging.warning(f"Secondary rate limit hit. Backing off for {wait_time:.0f} seconds...")
-                    time.sleep(wait_time)
-                continue
-
-        if remaining < 5:
-            wait_time = reset_time - time.time()
-            if wait_time > 0:
-                logging.warning(f"Rate limit nearly exhausted. Waiting {wait_time:.0f} seconds...")
-                time.sleep(wait_time + 1)
+        github_limiter.wait_if_needed(method, url)
+        if is_write:
+            github_write_controller.acquire()
+        secondary_limit = False
+        try:
+            response = endpoint.client.request(method, url, headers=headers, params=params, json=json)
+            github_limiter.update(response)
+
+            reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
+
+            if response.status_code in (429, 403):
+                # Throttle responses from proxies can be HTML or empty
+                try:
+                    error_data = response.json()
+                except ValueError:
+                    error_data = {}
+                message = error_data.get('message', '') if isinstance(error_data, dict) else ''
+                request_id = (message.split('request ID ')[-1].split() or ['unknown'])[0]
+                logging.warning(f"Rate limit exceeded. Request ID: {request_id}")
+                secondary_limit = 'secondary rate limit' in message
+        finally:
+            # The write slot has to be given back whatever happened above
+            if is_write:
+                github_write_controller.release(throttled=secondary_limit)
+
+        if secondary_limit:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                wait_time = int(retry_after)
+            else:
+                wait_time = max(reset_time - time.time(), 60)
+            logging.warning(f"Secondary rate limit hit. Waiting {wait_time:.0f} seconds...")
+            # Writers wait on the controller, everything else sleeps here
+            github_write_controller.pause(wait_time)
+            if not is_write:
+                time.sleep(wait_time)
+            continue
 
         if response.status_code != 403:
             return response
@@ -84,83 +227,543 @@ def make_github_request(method, url, headers, params=None, json=None, max_retrie
 
     return response
 
-# Create a new GitHub issue
-def create_github_issue(github_repo, github_token,
-    issue_title, final_description,
-    issue_owner, label_list,
-    issue_status, issue_created,
-    comments_list,
-    poll_interval=0.5,   # seconds between polls
-    poll_timeout=30): # give up after N seconds
-
-    if len(final_description)> 65000:
-        logging.warning(f"Description too long ({len(final_description)}). Truncating to 65000 characters.")
-        final_description = final_description[:65000]
-
-    # 1) Create the issue
-    url = f"https://api.github.com/repos/{github_repo}/import/issues"
-    headers = {
+def _import_headers(github_token):
+    return {
         'Authorization': f'token {github_token}',
         'Accept': 'application/vnd.github.golden-comet-preview+json',
         'Content-Type': 'application/json'
     }
+
+
+# GitHub rejects import requests over 1 MB, keep some headroom for the headers
+MAX_IMPORT_BYTES = 1024 * 1024 - 16 * 1024
+# Issue and comment bodies are limited to 65536 characters
+MAX_BODY_CHARS = 65000
+
+
+def _json_size(value) -> int:
+    # Same serialization as requests uses for json=
+    return len(json.dumps(value, allow_nan=False).encode('utf-8'))
+
+
+def _split_body(body, limit=MAX_BODY_CHARS):
+    return [body[i:i + limit] for i in range(0, len(body), limit)] or ['']
+
+
+def pack_import_payload(issue_title, final_description,
+    issue_owner, label_list,
+    issue_status, issue_created,
+    comments_list):
+    """Build the import payload, filled up to just under GitHub's limits.
+
+    Returns ``(payload, overflow)``. A description longer than the body
+    limit continues in comments right after the issue, with the issue's
+    ``created_at`` so they stay first. Comments are added in order while
+    the request stays under ``MAX_IMPORT_BYTES``. Each piece is serialized
+    once and the sizes are summed, the whole payload is never re-dumped.
+    The comments that did not fit are returned in *overflow*, to be added
+    after the issue exists.
+    """
+    description_parts = _split_body(final_description)
+    if len(description_parts) > 1:
+        logging.warning(f"Description too long ({len(final_description)}). Continuing it in {len(description_parts) - 1} comments.")
+    comments = [
+        {"body": f"*Description continued ({idx}/{len(description_parts) - 1})*\n{part}", "created_at": issue_created}
+        for idx, part in enumerate(description_parts[1:], start=1)
+    ]
+    for comment in comments_list:
+        parts = _split_body(comment['body'])
+        comments.extend({"body": part, "created_at": comment['created_at']} for part in parts)
+
     payload = {
         "issue": {
             "title": issue_title,
-            "body": final_description, # truncate to GitHub issue body max length
+            "body": description_parts[0],
             "created_at": issue_created,
             "closed": issue_status,
             "assignee": issue_owner,
             "labels": label_list
         },
-        "comments": comments_list, # limit to 100 comments
+        "comments": [],
     }
 
-    response = make_github_request(requests.post, url, headers=headers, json=payload)
+    # Size with an empty comment list, each comment adds its own size plus ", "
+    size = _json_size(payload)
+    for count, comment in enumerate(comments):
+        size += _json_size(comment) + (2 if count else 0)
+        if size > MAX_IMPORT_BYTES:
+            logging.warning(f"Import payload is full after {count} comments, adding {len(comments) - count} after the import.")
+            payload["comments"] = comments[:count]
+            return payload, comments[count:]
 
-    # 1) If they let us create immediately (unlikely for import), handle 201:
-    if response.status_code == 201:
-        issue_number = response.json().get('number')
-        logging.info(f"GitHub issue created immediately: #{issue_number}")
-        return issue_number
+    payload["comments"] = comments
+    return payload, []
 
-    # 2) Handle the async import case
-    if response.status_code == 202:
-        data = response.json()
-        import_id     = data['id']
-        status_url    = data['url']
-        logging.info(f"Issue import (job {import_id}). Polling {status_url}…")
 
-        # Poll until done or timeout
-        start_time = time.time()
-        while True:
-            status_resp = make_github_request(requests.get, status_url,
-                                              headers=headers)
-            status_resp_json = status_resp.json()
-            status = status_resp_json.get('status')
+class IncompleteImport(Exception):
+    """The issue was imported but not all of its overflow comments could be added.
 
-            if status in ('imported', 'failed'):
-                break
+    *posted* is how many of them are on the issue, ``ImportTracker.complete``
+    picks up from there.
+    """
+
+    def __init__(self, issue_number, posted):
+        super().__init__(f"Issue #{issue_number} is missing comments, only {posted} were added after the import")
+        self.issue_number = issue_number
+        self.posted = posted
+
+
+class ImportTracker:
+    """Submits issue imports without waiting for them to finish.
+
+    ``submit`` queues the import and returns a ``Future`` that resolves to
+    the GitHub issue number, or ``None`` when the import failed. Imports are
+    posted by a pool of threads, as fast as the rate limiter and the write
+    window allow. The ids of the accepted (202) jobs are kept in a table
+    that a single background thread resolves in bulk through
+    ``GET /repos/{repo}/import/issues?since=``, instead of one status call
+    per job. ``since`` follows the oldest pending job so the listing stays
+    short during long runs.
+
+    At most *max_queued* imports wait to be posted, ``submit`` blocks when
+    the queue is full so memory stays bounded. Comments that do not fit the
+    import request (see ``pack_import_payload``) are added once the issue
+    exists, before its future resolves. If one of them cannot be added the
+    future fails with ``IncompleteImport`` instead.
+    """
+
+    def __init__(self, github_repo, github_token, max_workers=8, max_queued=32,
+                 poll_interval=2.0, poll_timeout=300):
+        self.github_repo = github_repo
+        self.github_token = github_token
+        self.poll_interval = poll_interval
+        self.poll_timeout = poll_timeout
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.comment_executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.queued = threading.BoundedSemaphore(max_queued)
+        # import id -> (future, submitted at, comments to add after the import)
+        self.pending: dict[int, tuple[Future, float, list[dict]]] = {}
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.poller = threading.Thread(target=self._poll_loop, daemon=True)
+        self.poller.start()
+
+    def submit(self, issue_title, final_description,
+        issue_owner, label_list,
+        issue_status, issue_created,
+        comments_list, callback=None, on_submitted=None) -> Future:
+        payload, overflow = pack_import_payload(
+            issue_title, final_description, issue_owner, label_list,
+            issue_status, issue_created, comments_list)
+
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+
+        self.queued.acquire()
+        self.executor.submit(self._post, future, payload, overflow, on_submitted)
+        return future
+
+    def resume(self, import_id, submitted_at, issue_title, final_description,
+        issue_owner, label_list,
+        issue_status, issue_created,
+        comments_list, callback=None) -> Future:
+        """Resolve an import that was submitted earlier, e.g. before a crash.
+
+        Takes the same issue as ``submit`` so the comments that did not fit
+        the original import are still added afterwards.
+        """
+        _, overflow = pack_import_payload(
+            issue_title, final_description, issue_owner, label_list,
+            issue_status, issue_created, comments_list)
+
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        with self.lock:
+            self.pending[import_id] = (future, submitted_at, overflow)
+        return future
+
+    def complete(self, issue_number, posted, issue_title, final_description,
+        issue_owner, label_list,
+        issue_status, issue_created,
+        comments_list, callback=None) -> Future:
+        """Add the overflow comments of an issue that was left incomplete.
+
+        The first *posted* comments that did not fit the import are on the
+        issue already, see ``IncompleteImport``.
+        """
+        _, overflow = pack_import_payload(
+            issue_title, final_description, issue_owner, label_list,
+            issue_status, issue_created, comments_list)
+
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        self.comment_executor.submit(self._add_overflow, future, issue_number, overflow, posted)
+        return future
+
+    def _post(self, future, payload, overflow, on_submitted):
+        try:
+            url = f"https://api.github.com/repos/{self.github_repo}/import/issues"
+            response = make_github_request(
+                'POST', url, headers=_import_headers(self.github_token), json=payload)
+        except Exception as e:
+            logging.error(f"Failed to start issue import: {e}")
+            future.set_result(None)
+            return
+        finally:
+            self.queued.release()
+
+        # If they let us create immediately (unlikely for import), handle 201
+        if response.status_code == 201:
+            issue_number = response.json().get('number')
+            logging.info(f"GitHub issue created immediately: #{issue_number}")
+            self._resolve(future, issue_number, overflow)
+        # The async import case, resolved by the poller
+        elif response.status_code == 202:
+            import_id = response.json()['id']
+            logging.info(f"Issue import (job {import_id}) submitted")
+            if on_submitted:
+                on_submitted(import_id)
+            with self.lock:
+                self.pending[import_id] = (future, time.time(), overflow)
+        else:
+            logging.error(f"Failed to start issue import: {response.status_code} {response.text}")
+            future.set_result(None)
+
+    def _poll_loop(self):
+        # close() only sets the event once every import has been posted
+        while not (self.closed.is_set() and not self.pending):
+            time.sleep(self.poll_interval)
+            with self.lock:
+                if not self.pending:
+                    continue
+                oldest = min(submitted_at for _, submitted_at, _ in self.pending.values())
+            self._poll_once(oldest)
+
+    def _poll_once(self, oldest):
+        try:
+            statuses = self._list_imports(oldest)
+        except Exception as e:
+            logging.error(f"Failed to poll issue imports: {e}")
+            statuses = {}
+        # Timed out jobs expire even when the listing failed, otherwise close() would wait forever
+        self._settle(statuses)
+
+    def _list_imports(self, oldest):
+        """Return import job id -> job for the jobs since *oldest*, empty when GitHub did not answer."""
+        # A minute of margin for the clock difference with GitHub
+        since = datetime.fromtimestamp(oldest - 60, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        url = f"https://api.github.com/repos/{self.github_repo}/import/issues"
+        params = {'since': since, 'per_page': 100}
+
+        statuses = {}
+        while url:
+            response = make_github_request(
+                'GET', url, headers=_import_headers(self.github_token), params=params)
+            if response.status_code != 200:
+                logging.error(f"Failed to list issue imports: {response.status_code} {response.text}")
+                return {}
+            statuses.update((job['id'], job) for job in response.json())
+            # The next link already carries the query parameters
+            url = response.links.get('next', {}).get('url')
+            params = None
+        return statuses
+
+    def _settle(self, statuses):
+        now = time.time()
+        with self.lock:
+            for import_id, (future, submitted_at, overflow) in list(self.pending.items()):
+                job = statuses.get(import_id, {})
+                status = job.get('status')
+                if status == 'imported':
+                    issue_number = job["issue_url"].split("/")[-1]
+                    logging.info(f"Issue number #{issue_number} succeeded.")
+                    result = issue_number
+                elif status == 'failed':
+                    logging.error(f"Issue import #{import_id} failed: {job}")
+                    result = None
+                elif now - submitted_at > self.poll_timeout:
+                    logging.error(f"Polling issue import #{import_id} timed out.")
+                    result = None
+                else:
+                    continue
+                del self.pending[import_id]
+                self._resolve(future, result, overflow)
+
+    def _resolve(self, future, issue_number, overflow):
+        if not issue_number or not overflow:
+            future.set_result(issue_number)
+            return
+
+        # GitHub orders comments by when they are posted, so the comments of
+        # one issue go one after another in a single task, the issues run
+        # concurrently. The result is set once all of them are posted.
+        self.comment_executor.submit(self._add_overflow, future, issue_number, overflow)
+
+    def _add_overflow(self, future, issue_number, overflow, posted=0):
+        for comment in overflow[posted:]:
+            # They cannot carry a created_at, so the original date goes at the top of the body
+            body = f"*{comment['created_at']}*\n{comment['body']}"
+            try:
+                added = add_github_comment(self.github_repo, self.github_token, issue_number, body)
+            except Exception as e:
+                logging.error(f"Failed to add comment to issue #{issue_number}: {e}")
+                added = False
+            if not added:
+                # Stop here, posting the later ones would put the comments out of order
+                future.set_exception(IncompleteImport(issue_number, posted))
+                return
+            posted += 1
+        logging.info(f"Added {len(overflow)} comments to issue #{issue_number} after the import.")
+        future.set_result(issue_number)
+
+    def close(self, timeout=None):
+        """Wait until every submitted import has been resolved.
+
+        Every import expires *poll_timeout* seconds after it was posted, so
+        polling is given that long (plus a minute) by default. Imports that
+        are still pending after *timeout* seconds resolve to ``None``.
+        """
+        self.executor.shutdown(wait=True)
+        self.closed.set()
+        if timeout is None:
+            timeout = self.poll_timeout + self.poll_interval + 60
+        self.poller.join(timeout)
+        if self.poller.is_alive():
+            with self.lock:
+                abandoned = list(self.pending.values())
+                self.pending.clear()
+            for future, _, _ in abandoned:
+                future.set_result(None)
+            logging.error(f"Gave up waiting for {len(abandoned)} issue imports after {timeout:.0f} seconds.")
+        self.comment_executor.shutdown(wait=True)
+
+
+# Create a new GitHub issue
+def create_github_issue(github_repo, github_token,
+    issue_title, final_description,
+    issue_owner, label_list,
+    issue_status, issue_created,
+    comments_list):
+    """Import a single issue and wait for the result.
+
+    Raises ``IncompleteImport`` when the issue was created without all of
+    its comments. Use an ``ImportTracker`` directly to import many issues.
+    """
+    tracker = ImportTracker(github_repo, github_token, max_workers=1, poll_interval=0.5)
+    try:
+        future = tracker.submit(issue_title, final_description, issue_owner, label_list,
+                                issue_status, issue_created, comments_list)
+        return future.result()
+    finally:
+        tracker.close()
+
+def add_github_comment(github_repo, github_token, issue_number, body):
+    url = f"https://api.github.com/repos/{github_repo}/issues/{issue_number}/comments"
+    headers = {
+        'Authorization': f'token {github_token}',
+        'Accept': 'application/vnd.github+json',
+    }
+    response = make_github_request('POST', url, headers=headers, json={"body": body})
+    if response.status_code != 201:
+        logging.error(f"Failed to add comment to issue #{issue_number}: {response.status_code} {response.text}")
+        return False
+    return True
+
+
+def list_issue_comments(github_repo, github_token, issue_number):
+    """Return the comments of issue *issue_number*, oldest first."""
+    url = f"https://api.github.com/repos/{github_repo}/issues/{issue_number}/comments"
+    headers = {
+        'Authorization': f'token {github_token}',
+        'Accept': 'application/vnd.github+json',
+    }
+    params = {'per_page': 100}
+
+    comments = []
+    while url:
+        response = make_github_request('GET', url, headers=headers, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to list comments of issue #{issue_number}: {response.status_code} {response.text}")
+        comments.extend(response.json())
+        # The next link already carries the query parameters
+        url = response.links.get('next', {}).get('url')
+        params = None
+    return comments
+
+def edit_github_comment(github_repo, github_token, comment_id, body):
+    url = f"https://api.github.com/repos/{github_repo}/issues/comments/{comment_id}"
+    headers = {
+        'Authorization': f'token {github_token}',
+        'Accept': 'application/vnd.github+json',
+    }
+    response = make_github_request('PATCH', url, headers=headers, json={"body": body})
+    if response.status_code != 200:
+        logging.error(f"Failed to edit comment {comment_id}: {response.status_code} {response.text}")
+        return False
+    return True
+
+def delete_github_comment(github_repo, github_token, comment_id):
+    url = f"https://api.github.com/repos/{github_repo}/issues/comments/{comment_id}"
+    headers = {
+        'Authorization': f'token {github_token}',
+        'Accept': 'application/vnd.github+json',
+    }
+    response = make_github_request('DELETE', url, headers=headers)
+    if response.status_code != 204:
+        logging.error(f"Failed to delete comment {comment_id}: {response.status_code} {response.text}")
+        return False
+    return True
+
+
+# A description continuation comment, those added after the import start with their date
+_CONTINUATION_RE = re.compile(r'(\*[^*\n]+\*\n)?\*Description continued \(\d+/\d+\)\*\n')
+
+
+def sync_description_continuation(github_repo, github_token, issue_number, parts):
+    """Make the "Description continued" comments of *issue_number* carry *parts*.
+
+    The comments already on the issue are edited in place, so they keep
+    their spot right after the description. Missing parts are added at the
+    end and surplus comments are deleted. Returns whether all of it worked.
+    """
+    existing = [comment for comment in list_issue_comments(github_repo, github_token, issue_number)
+                if _CONTINUATION_RE.match(comment['body'])]
+    bodies = [f"*Description continued ({idx}/{len(parts)})*\n{part}" for idx, part in enumerate(parts, start=1)]
 
-            if time.time() - start_time > poll_timeout:
-                logging.error("Polling timed out.")
-                return None
+    for comment, body in zip(existing, bodies):
+        # Keep the date of the comments added after the import
+        body = (_CONTINUATION_RE.match(comment['body']).group(1) or '') + body
+        if comment['body'] != body and not edit_github_comment(github_repo, github_token, comment['id'], body):
+            return False
+    for body in bodies[len(existing):]:
+        if not add_github_comment(github_repo, github_token, issue_number, body):
+            return False
+    for comment in existing[len(bodies):]:
+        if not delete_github_comment(github_repo, github_token, comment['id']):
+            return False
+    return True
 
-            logging.debug(f"Import job {import_id} still pending…")
-            time.sleep(poll_interval)
 
-        if status == 'imported':
-            issue_number = status_resp_json["issue_url"].split("/")[-1]
-            logging.info(f"Issue number #{issue_number} succeeded.")
-            return issue_number
+# Update an already imported GitHub issue
+def update_github_issue(github_repo, github_token, issue_number,
+    issue_title, final_description,
+    issue_owner, label_list,
+    issue_status,
+    new_comments, description_changed=True):
+    """Bring issue *issue_number* in line with its Jira issue.
+
+    The import API cannot touch an existing issue, so the title, body,
+    state, assignee and labels are patched and *new_comments* are added as
+    regular comments. Those cannot carry their original ``created_at``, so
+    the date is written at the top of the body instead. A description
+    longer than the body limit continues in comments, like on import.
+    Those are only brought in line when *description_changed*, see
+    ``sync_description_continuation``.
+    """
+    description_parts = _split_body(final_description)
+    if len(description_parts) > 1:
+        logging.warning(f"Description too long ({len(final_description)}). Continuing it in {len(description_parts) - 1} comments.")
 
-        # status == 'failed'
-        logging.error(f"Issue import #{import_id} failed: {status_resp_json}")
+    url = f"https://api.github.com/repos/{github_repo}/issues/{issue_number}"
+    headers = {
+        'Authorization': f'token {github_token}',
+        'Accept': 'application/vnd.github+json',
+    }
+    payload = {
+        "title": issue_title,
+        "body": description_parts[0],
+        "state": "closed" if issue_status else "open",
+        "assignees": [issue_owner] if issue_owner else [],
+        "labels": label_list,
+    }
+    response = make_github_request('PATCH', url, headers=headers, json=payload)
+    if response.status_code != 200:
+        logging.error(f"Failed to update issue #{issue_number}: {response.status_code} {response.text}")
         return None
 
-    # 3) Any other status is an error
-    logging.error(f"Failed to start issue import: {response.status_code} {response.text}")
-    return None
+    if description_changed:
+        try:
+            synced = sync_description_continuation(github_repo, github_token, issue_number, description_parts[1:])
+        except RuntimeError as e:
+            logging.error(e)
+            synced = False
+        if not synced:
+            return None
+
+    bodies = []
+    for comment in new_comments:
+        bodies.extend(f"*{comment['created_at']}*\n{part}" for part in _split_body(comment['body']))
+
+    # One after another, GitHub orders comments by when they are posted
+    for body in bodies:
+        if not add_github_comment(github_repo, github_token, issue_number, body):
+            return None
+
+    logging.info(f"Issue number #{issue_number} updated with {len(new_comments)} new comments.")
+    return issue_number
+
+
+# Labels that are not in config/list.csv get GitHub's default colour
+DEFAULT_LABEL_COLOR = 'ededed'
+
+
+def list_labels(github_repo, github_token):
+    """Return the names of all labels in the repo."""
+    url = f"https://api.github.com/repos/{github_repo}/labels"
+    headers = {
+        'Authorization': f'token {github_token}',
+        'Accept': 'application/vnd.github+json',
+    }
+    params = {'per_page': 100}
+
+    labels = []
+    while url:
+        response = make_github_request('GET', url, headers=headers, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to list labels: {response.status_code} {response.text}")
+        labels.extend(label['name'] for label in response.json())
+        # The next link already carries the query parameters
+        url = response.links.get('next', {}).get('url')
+        params = None
+    return labels
+
+
+def create_label(github_repo, github_token, name, color=DEFAULT_LABEL_COLOR):
+    url = f"https://api.github.com/repos/{github_repo}/labels"
+    headers = {
+        'Authorization': f'token {github_token}',
+        'Accept': 'application/vnd.github+json',
+    }
+    response = make_github_request('POST', url, headers=headers, json={'name': name, 'color': color.lstrip('#')})
+    # 422 means it already exists, e.g. created by an import in the meantime
+    if response.status_code not in (201, 422):
+        logging.error(f"Failed to create label '{name}': {response.status_code} {response.text}")
+        return False
+    return True
+
+
+def provision_labels(github_repo, github_token, labels, max_workers=8):
+    """Make sure every label in *labels* (name -> colour) exists in the repo.
+
+    The existing labels are listed once and only the missing ones are
+    created, concurrently, so imports never have to create labels (which
+    would also leave them without a colour). Returns the names that exist
+    afterwards. GitHub compares label names case-insensitively.
+    """
+    existing = {name.casefold() for name in list_labels(github_repo, github_token)}
+    missing = {name: color for name, color in labels.items() if name.casefold() not in existing}
+    logging.info(f"{len(labels)} labels needed, {len(missing)} of them are missing in GitHub")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda item: create_label(github_repo, github_token, *item), missing.items())
+        failed = {name for name, created in zip(missing, results) if not created}
+
+    return [name for name in labels if name not in failed]
 
 def list_projects(github_repo, github_token):
     owner, repo = github_repo.split('/')
@@ -182,7 +785,7 @@ def list_projects(github_repo, github_token):
     variables = {'owner': owner, 'repo': repo}
     
     response = make_github_request(
-        requests.post,
+        'POST',
         "https://api.github.com/graphql",
         headers={
             'Authorization': f'Bearer {github_token}',
@@ -195,76 +798,244 @@ def list_projects(github_repo, github_token):
         return data.get('data', {}).get('repository', {}).get('projectsV2', {}).get('nodes', [])
     return []
 
-def add_issue_to_project(github_repo, github_token, project_id, issue_number):
-    owner, repo = github_repo.split('/')
-    
-    # First get issue node ID using GraphQL
-    issue_query = """
-    query($owner: String!, $repo: String!, $number: Int!) {
-        repository(owner: $owner, name: $repo) {
-            issue(number: $number) {
-                id
-            }
-        }
-    }
-    """
-    
-    variables = {
-        'owner': owner,
-        'repo': repo,
-        'number': int(issue_number)
-    }
-    
-    # Get issue node ID
-    response = make_github_request(
-        requests.post,
+def _graphql(github_token, query, variables):
+    return make_github_request(
+        'POST',
         "https://api.github.com/graphql",
         headers={
             'Authorization': f'Bearer {github_token}',
             'Content-Type': 'application/json',
         },
-        json={'query': issue_query, 'variables': variables}
+        json={'query': query, 'variables': variables}
     )
-    
-    if response.status_code != 200:
-        logging.error(f"Failed to get issue node ID: {response.status_code}")
-        return False
-        
-    issue_node_id = response.json().get('data', {}).get('repository', {}).get('issue', {}).get('id')
-    if not issue_node_id:
-        logging.error("Could not find issue node ID")
-        return False
-    
-    # Add issue to project using mutation
-    mutation = """
-    mutation($projectId: ID!, $contentId: ID!) {
-        addProjectV2ItemById(input: {projectId: $projectId, contentId: $contentId}) {
-            item {
-                id
+
+
+# Migrated issues are titled "[KEY-123] Summary"
+_ISSUE_KEY_TITLE = re.compile(r'^\[([A-Za-z][A-Za-z0-9_]*-\d+)\]')
+
+
+def iter_github_issues(github_repo, github_token, page_size=100):
+    """Yield every issue in the repo (open and closed), oldest first.
+
+    One GraphQL query per *page_size* issues, each issue is a dict with
+    only its node ``id``, ``number`` and ``title``.
+    """
+    owner, repo = github_repo.split('/')
+    query = """
+    query($owner: String!, $repo: String!, $first: Int!, $after: String) {
+        repository(owner: $owner, name: $repo) {
+            issues(first: $first, after: $after, orderBy: {field: CREATED_AT, direction: ASC}) {
+                pageInfo {
+                    hasNextPage
+                    endCursor
+                }
+                nodes {
+                    id
+                    number
+                    title
+                }
             }
         }
     }
     """
-    
-    variables = {
-        'projectId': project_id,
-        'contentId': issue_node_id
-    }
-    
-    response = make_github_request(
-        requests.post,
-        "https://api.github.com/graphql",
-        headers={
-            'Authorization': f'Bearer {github_token}',
-            'Content-Type': 'application/json',
-        },
-        json={'query': mutation, 'variables': variables}
-    )
-    logging.info(f"Response received for add_issue_to_project: {response.status_code}")
-    success = response.status_code == 200 and 'errors' not in response.json()
+    variables = {'owner': owner, 'repo': repo, 'first': page_size, 'after': None}
+
+    while True:
+        response = _graphql(github_token, query, variables)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to list GitHub issues: {response.status_code} {response.text}")
+        body = response.json()
+        if body.get('errors'):
+            raise RuntimeError(f"Failed to list GitHub issues: {body['errors']}")
+
+        issues = body['data']['repository']['issues']
+        yield from issues['nodes']
+
+        if not issues['pageInfo']['hasNextPage']:
+            break
+        variables['after'] = issues['pageInfo']['endCursor']
+
+
+def jira_key_of(issue_title):
+    """Return the Jira key of a migrated issue title, or ``None``."""
+    match = _ISSUE_KEY_TITLE.match(issue_title)
+    return match.group(1) if match else None
+
+
+def index_github_issues(github_repo, github_token, page_size=100):
+    """Return a Jira key -> issue number index of the issues in the repo.
+
+    Pages through every issue with ``iter_github_issues``, fetching only
+    titles and numbers, instead of a search call per Jira issue. When a key
+    occurs more than once the oldest issue wins.
+    """
+    index = {}
+    scanned = 0
+    for node in iter_github_issues(github_repo, github_token, page_size):
+        key = jira_key_of(node['title'])
+        if key:
+            index.setdefault(key, node['number'])
+        scanned += 1
+
+    logging.info(f"Indexed {scanned} GitHub issues, {len(index)} of them are migrated Jira issues")
+    return index
+
+
+# github_repo -> logins that can be assigned, fetched once per process
+_assignable_users = {}
+_assignable_users_lock = threading.Lock()
+
+
+def list_assignable_users(github_repo, github_token, page_size=100):
+    """Return the logins (case-folded) that issues in the repo can be assigned to.
+
+    Paged with one GraphQL query per *page_size* users and cached, so the
+    check costs a handful of calls per run no matter how many issues there are.
+    """
+    with _assignable_users_lock:
+        if github_repo in _assignable_users:
+            return _assignable_users[github_repo]
+
+        owner, repo = github_repo.split('/')
+        query = """
+        query($owner: String!, $repo: String!, $first: Int!, $after: String) {
+            repository(owner: $owner, name: $repo) {
+                assignableUsers(first: $first, after: $after) {
+                    pageInfo {
+                        hasNextPage
+                        endCursor
+                    }
+                    nodes {
+                        login
+                    }
+                }
+            }
+        }
+        """
+        variables = {'owner': owner, 'repo': repo, 'first': page_size, 'after': None}
+
+        logins = set()
+        while True:
+            response = _graphql(github_token, query, variables)
+            if response.status_code != 200:
+                raise RuntimeError(f"Failed to list assignable users: {response.status_code} {response.text}")
+            body = response.json()
+            if body.get('errors'):
+                raise RuntimeError(f"Failed to list assignable users: {body['errors']}")
+
+            users = body['data']['repository']['assignableUsers']
+            logins.update(node['login'].casefold() for node in users['nodes'])
+            if not users['pageInfo']['hasNextPage']:
+                break
+            variables['after'] = users['pageInfo']['endCursor']
+
+        logging.info(f"{len(logins)} users can be assigned issues in {github_repo}")
+        _assignable_users[github_repo] = logins
+        return logins
+
+
+def add_issues_to_project(github_repo, github_token, project_id, issue_numbers, batch_size=50):
+    """Add many issues to a project, returns the numbers that were added.
+
+    Per batch of *batch_size* issues one aliased query resolves all the
+    issue node ids and one aliased mutation adds them to the project, so
+    2×N calls become about 2×N/batch_size. The default of 50 keeps each
+    mutation well inside GitHub's GraphQL node and cost limits.
+    """
+    owner, repo = github_repo.split('/')
+    added = []
+
+    for start in range(0, len(issue_numbers), batch_size):
+        batch = [int(number) for number in issue_numbers[start:start + batch_size]]
+
+        # First get the issue node IDs, one alias per issue
+        aliases = '\n'.join(f'i{idx}: issue(number: {number}) {{ id }}' for idx, number in enumerate(batch))
+        issue_query = f"""
+        query($owner: String!, $repo: String!) {{
+            repository(owner: $owner, name: $repo) {{
+                {aliases}
+            }}
+        }}
+        """
+        response = _graphql(github_token, issue_query, {'owner': owner, 'repo': repo})
+        if response.status_code != 200:
+            logging.error(f"Failed to get issue node IDs: {response.status_code}")
+            continue
+
+        repository = (response.json().get('data') or {}).get('repository') or {}
+        node_ids = {}
+        for idx, number in enumerate(batch):
+            node = repository.get(f'i{idx}')
+            if node:
+                node_ids[idx] = node['id']
+            else:
+                logging.error(f"Could not find issue node ID for #{number}")
+        if not node_ids:
+            continue
+
+        # Then add them to the project, one aliased mutation per issue
+        parameters = ', '.join(f'$c{idx}: ID!' for idx in node_ids)
+        mutations = '\n'.join(
+            f'a{idx}: addProjectV2ItemById(input: {{projectId: $projectId, contentId: $c{idx}}}) {{ item {{ id }} }}'
+            for idx in node_ids)
+        mutation = f"""
+        mutation($projectId: ID!, {parameters}) {{
+            {mutations}
+        }}
+        """
+        variables = {'projectId': project_id}
+        variables.update({f'c{idx}': node_id for idx, node_id in node_ids.items()})
+
+        response = _graphql(github_token, mutation, variables)
+        logging.info(f"Response received for add_issues_to_project: {response.status_code}")
+        if response.status_code != 200:
+            logging.error(f"Failed to add issues to project: {response.text}")
+            continue
+
+        body = response.json()
+        for error in body.get('errors', []):
+            logging.error(f"Failed to add issue to project: {error}")
+        data = body.get('data') or {}
+        for idx in node_ids:
+            if data.get(f'a{idx}'):
+                added.append(batch[idx])
+        logging.info(f"Added {len(added)} issues to project so far")
+
+    return added
+
+
+def delete_issues(github_token, issue_ids):
+    """Delete the issues with node ids *issue_ids* in one aliased mutation.
+
+    Returns the ids that were deleted. Deleting issues needs admin rights on
+    the repo.
+    """
+    parameters = ', '.join(f'$i{idx}: ID!' for idx in range(len(issue_ids)))
+    mutations = '\n'.join(
+        f'd{idx}: deleteIssue(input: {{issueId: $i{idx}}}) {{ clientMutationId }}'
+        for idx in range(len(issue_ids)))
+    mutation = f"""
+    mutation({parameters}) {{
+        {mutations}
+    }}
+    """
+    variables = {f'i{idx}': issue_id for idx, issue_id in enumerate(issue_ids)}
+
+    response = _graphql(github_token, mutation, variables)
+    if response.status_code != 200:
+        logging.error(f"Failed to delete issues: {response.status_code} {response.text}")
+        return []
+
+    body = response.json()
+    for error in body.get('errors', []):
+        logging.error(f"Failed to delete issue: {error}")
+    data = body.get('data') or {}
+    # Failed aliases come back as null
+    return [issue_id for idx, issue_id in enumerate(issue_ids) if f'd{idx}' in data and data[f'd{idx}'] is not None]
+
+
+def add_issue_to_project(github_repo, github_token, project_id, issue_number):
+    success = bool(add_issues_to_project(github_repo, github_token, project_id, [issue_number]))
     if success:
         logging.info(f"Added issue #{issue_number} to project")
-    else:
-        logging.error(f"Failed to add issue to project: {response.text}")
-    
     return success
@@ -1,74 +1,373 @@
+import hashlib
 import requests
 from requests.auth import HTTPBasicAuth
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Iterator
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from itertools import islice
 import logging
+import random
 import re
 import os
+import threading
+import time
 
 import config.custom_fields_to_use
+import endpoint.cache
+import endpoint.client
 
-# Fetch Jira issues
-def fetch_jira_issues(
+# Jira caps the bulk fetch endpoint at 100 issues per request
+BULK_FETCH_MAX = 100
+
+# Fields the migration in issues.py actually reads from an issue
+ISSUE_FIELDS = [
+    'summary',
+    'description',
+    'reporter',
+    'assignee',
+    'created',
+    'attachment',
+    'issuelinks',
+    'labels',
+    'priority',
+    'status',
+    'issuetype',
+    'comment',
+    'updated',
+]
+
+
+def get_issue_fields() -> list[str]:
+    """Return the fields to request for an issue instead of ``*all``.
+
+    These are the fields used by the migration plus the custom fields
+    listed in ``config/custom_fields_to_use.py``.
+    """
+    custom_fields = [field for field in config.custom_fields_to_use.fields
+                     if field not in ISSUE_FIELDS]
+    return ISSUE_FIELDS + custom_fields
+
+
+def get_issue_fields_hash() -> str:
+    """Short hash of ``get_issue_fields()``, cached issues are only valid for the same fields."""
+    return hashlib.sha256(','.join(get_issue_fields()).encode('utf-8')).hexdigest()[:16]
+
+
+class JiraRateLimiter:
+    """Adaptive rate limiter shared by every thread that talks to Jira.
+
+    Requests are spaced by ``interval`` seconds, which starts at zero. When
+    Jira answers 429/503 every thread is paused for ``Retry-After`` (or an
+    exponential backoff with jitter when it is missing) and the interval is
+    doubled. Each successful response shrinks the interval again, so the
+    request rate settles just below what Jira tolerates. When
+    ``X-RateLimit-Remaining`` runs out the threads wait for
+    ``X-RateLimit-Reset``.
+    """
+
+    def __init__(self, max_interval=5.0, max_backoff=120.0):
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+        self.interval = 0.0
+        self.next_slot = 0.0
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def wait_if_needed(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_slot, self.paused_until)
+            self.next_slot = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update(self, response, attempt):
+        """Adjust to *response*. Returns the seconds to wait before a retry, or None."""
+        if response.status_code in (429, 503):
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                wait_time = float(retry_after)
+            else:
+                wait_time = min(self.max_backoff, 2 ** attempt) * random.uniform(0.5, 1.0)
+            with self.lock:
+                self.interval = min(self.max_interval, max(self.interval * 2, 0.1))
+            self._pause(wait_time)
+            return wait_time
+
+        with self.lock:
+            self.interval = self.interval * 0.9 if self.interval > 0.01 else 0.0
+            if response.headers.get('X-RateLimit-NearLimit') == 'true':
+                self.interval = min(self.max_interval, max(self.interval * 2, 0.1))
+
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining is not None and reset and int(remaining) <= 0:
+            wait_time = _seconds_until(reset)
+            if wait_time > 0:
+                logging.warning(f"Jira rate limit exhausted. Waiting {wait_time:.0f} seconds...")
+                self._pause(wait_time)
+        return None
+
+
+def _seconds_until(reset: str) -> float:
+    # Jira sends an ISO 8601 timestamp, fall back to epoch seconds
+    try:
+        return datetime.fromisoformat(reset).timestamp() - time.time()
+    except ValueError:
+        return float(reset) - time.time()
+
+
+jira_limiter = JiraRateLimiter()
+
+
+def _jira_request(method: str, url: str, auth: HTTPBasicAuth, max_retries=6, **kwargs) -> requests.Response:
+    """Send a request to Jira through the shared pooled session and rate limiter.
+
+    Throttled requests (429/503) are retried up to *max_retries* times, the
+    last response is returned when they keep failing.
+    """
+    headers = {'Accept': 'application/json', **kwargs.pop('headers', {})}
+    for attempt in range(max_retries):
+        jira_limiter.wait_if_needed()
+        response = endpoint.client.request(method, url, headers=headers, auth=auth, **kwargs)
+        wait_time = jira_limiter.update(response, attempt)
+        if wait_time is None:
+            return response
+        logging.warning(f"Jira throttled the request ({response.status_code}). Retrying in {wait_time:.0f} seconds...")
+    return response
+
+
+def _fetch_search_page(
+    auth: HTTPBasicAuth,
+    jira_base_url: str,
+    jql: str,
+    start_at: int,
+    page_size: int,
+    fields: str,
+) -> dict:
+    """Fetch a single page of ``/rest/api/3/search`` results."""
+    resp = _jira_request(
+        'GET',
+        f"{jira_base_url}/rest/api/3/search",
+        auth,
+        params={
+            "jql": jql,
+            "startAt": start_at,
+            "maxResults": page_size,
+            'fields': fields
+        },
+        timeout=30,
+    )
+    try:
+        resp.raise_for_status()
+    except requests.exceptions.HTTPError as err:
+        logging.error("Jira search failed: %s - %s", err, resp.text)
+        raise
+
+    return resp.json()
+
+
+# Page through the Jira issues with only a few fields
+def iter_jira_issue_stub_pages(
     jira_base_url: str,
     jira_user: str,
     jira_api_token: str,
     jql: str,
-    page_size: int = 100,
-) -> list[dict]:
-    """Return **all** issues matching *jql*."""
-    issues: list[dict] = []
-    start_at = 0
+    fields: tuple[str, ...] = ('updated',),
+    page_size: int = 1000,
+    max_workers: int = 4,
+) -> Iterator[list[dict]]:
+    """Yield the pages of issues matching *jql* with only *fields*, in search order.
 
-    session = requests.Session()
-    session.headers.update({"Accept": "application/json"})
-    session.auth = HTTPBasicAuth(jira_user, jira_api_token)
+    With just a few fields the pages are small. The first page is yielded
+    as soon as it arrives, it tells us the total and the page size Jira
+    actually granted. The remaining pages are then requested concurrently.
+    """
+    auth = HTTPBasicAuth(jira_user, jira_api_token)
+    fields = ','.join(fields)
 
-    while True:
-        resp = session.get(
-            f"{jira_base_url}/rest/api/3/search",
-            params={
-                "jql": jql,
-                "startAt": start_at,
-                "maxResults": page_size,
-                'fields': '*all'
+    first = _fetch_search_page(auth, jira_base_url, jql, 0, page_size, fields)
+    stubs = first.get("issues", [])
+    total = first.get("total", 0)
+    logging.info(f"Jira search matched {total} issues")
+
+    if stubs:
+        yield stubs
+    if not stubs or len(stubs) >= total:
+        return
+
+    step = len(stubs)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pages = executor.map(
+            lambda start_at: _fetch_search_page(
+                auth, jira_base_url, jql, start_at, step, fields),
+            range(step, total, step),
+        )
+        for data in pages:
+            yield data.get("issues", [])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _fetch_issue(auth: HTTPBasicAuth, jira_base_url: str, issue_key: str) -> dict:
+    """Load a single issue with the same fields as the bulk fetch."""
+    resp = _jira_request(
+        'GET',
+        f"{jira_base_url}/rest/api/3/issue/{issue_key}",
+        auth,
+        params={'fields': ','.join(get_issue_fields())},
+        timeout=30,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _fetch_issue_chunk(auth: HTTPBasicAuth, jira_base_url: str, stubs: list[dict], on_failed=None) -> list[dict]:
+    """Load the full issues for *stubs*, from the cache or with one bulk fetch call.
+
+    Issues the bulk fetch could not load are retried one at a time. Those
+    that still fail are left out and passed to *on_failed* with the error.
+    """
+    cache = endpoint.cache.get_jira_cache()
+    fields_hash = get_issue_fields_hash()
+
+    issues = {}
+    if cache:
+        for stub in stubs:
+            issue = cache.get('issue', stub['key'], stub['fields'].get('updated'), fields_hash)
+            if issue is not None:
+                issues[stub['key']] = issue
+
+    missing = [stub['key'] for stub in stubs if stub['key'] not in issues]
+    if missing:
+        resp = _jira_request(
+            'POST',
+            f"{jira_base_url}/rest/api/3/issue/bulkfetch",
+            auth,
+            json={
+                "issueIdsOrKeys": missing,
+                "fields": get_issue_fields(),
             },
-            timeout=30,
+            timeout=60,
         )
         try:
             resp.raise_for_status()
         except requests.exceptions.HTTPError as err:
-            logging.error("Jira search failed: %s - %s", err, resp.text)
+            logging.error("Jira bulk fetch failed: %s - %s", err, resp.text)
             raise
 
         data = resp.json()
-        page = data.get("issues", [])
-        issues.extend(page)
+        for error in data.get("issueErrors", []):
+            logging.error(f"Jira bulk fetch could not load issues: {error}")
 
-        page_len = len(page)
-        total = data.get("total", 0)
+        for issue in data.get("issues", []):
+            issues[issue["key"]] = issue
+            if cache:
+                cache.put('issue', issue['key'], issue['fields'].get('updated'), issue, fields_hash)
+
+        # Keys in issueErrors (or simply not returned) get a second chance on their own
+        for stub in stubs:
+            if stub['key'] in issues:
+                continue
+            try:
+                issue = _fetch_issue(auth, jira_base_url, stub['key'])
+            except requests.exceptions.RequestException as err:
+                logging.error(f"Could not load issue {stub['key']}: {err}")
+                if on_failed:
+                    on_failed(stub, str(err))
+                continue
+            issues[stub['key']] = issue
+            if cache:
+                cache.put('issue', issue['key'], issue['fields'].get('updated'), issue, fields_hash)
+
+    # The bulk endpoint does not guarantee ordering, restore the search order
+    return [issues[stub['key']] for stub in stubs if stub['key'] in issues]
 
-        if page_len == 0 or start_at + page_len >= total:
-            break
 
-        start_at += page_len
+# Load Jira issues in parallel chunks
+def hydrate_jira_issues(
+    jira_base_url: str,
+    jira_user: str,
+    jira_api_token: str,
+    stubs: list[dict],
+    chunk_size: int = BULK_FETCH_MAX,
+    max_workers: int = 4,
+    on_failed=None,
+) -> Iterator[dict]:
+    """Yield the full issues for *stubs*, loaded in parallel.
+
+    The issues are loaded in chunks of *chunk_size* through a pool of
+    *max_workers*. Issues whose ``updated`` timestamp matches the on-disk
+    cache are not fetched again. Issues are yielded in the order of *stubs*
+    and at most *max_workers* chunks are in flight at any time. Issues that
+    cannot be loaded are not yielded, they are passed to
+    ``on_failed(stub, error)`` (called from the worker threads) instead.
+    """
+    chunk_size = min(chunk_size, BULK_FETCH_MAX)
+    chunks = (stubs[i:i + chunk_size] for i in range(0, len(stubs), chunk_size))
+
+    auth = HTTPBasicAuth(jira_user, jira_api_token)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(_fetch_issue_chunk, auth, jira_base_url, chunk, on_failed))
+            if len(in_flight) >= max_workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Stream Jira issues
+def iter_jira_issues(
+    jira_base_url: str,
+    jira_user: str,
+    jira_api_token: str,
+    jql: str,
+    stub_fields: tuple[str, ...] = ('updated',),
+    on_page=None,
+    on_failed=None,
+    max_workers: int = 4,
+) -> Iterator[dict]:
+    """Yield the full issues matching *jql*, starting as soon as the first page is listed.
 
-    return issues
+    Every page of stubs (with *stub_fields*) is passed to ``on_page(stubs)``
+    before its issues are loaded with ``hydrate_jira_issues``, e.g. to
+    create the labels they need. *on_failed* is passed on to it.
+    """
+    for stubs in iter_jira_issue_stub_pages(
+            jira_base_url, jira_user, jira_api_token, jql, stub_fields, max_workers=max_workers):
+        if on_page:
+            on_page(stubs)
+        yield from hydrate_jira_issues(
+            jira_base_url, jira_user, jira_api_token, stubs, max_workers=max_workers, on_failed=on_failed)
 
 
 # Fetch Jira comments
-def fetch_all_jira_comments(jira_base_url, jira_user, jira_api_token, issue_key) -> list[dict]:
-    start_at = 0
+def fetch_all_jira_comments(jira_base_url, jira_user, jira_api_token, issue_key, start_at=0) -> list[dict]:
     all_comments = []
+    auth = HTTPBasicAuth(jira_user, jira_api_token)
 
     while True:
         url = f"{jira_base_url}/rest/api/3/issue/{issue_key}/comment"
         params = {'startAt': start_at, 'maxResults': 100}
-        headers = {'Accept': 'application/json'}
-        auth = HTTPBasicAuth(jira_user, jira_api_token)
 
-        response = requests.get(url, headers=headers, auth=auth, params=params)
-        if response.status_code != 200:
-            logging.error(f"Failed to fetch comments for issue {issue_key}: {response.status_code} - {response.text}")
-            break
+        response = _jira_request('GET', url, auth, params=params)
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as err:
+            # Do not carry on with only part of the comments
+            logging.error(f"Failed to fetch comments for issue {issue_key}: {err} - {response.text}")
+            raise
 
         data = response.json()
         comments = data.get("comments", [])
@@ -79,24 +378,122 @@ def fetch_all_jira_comments(jira_base_url, jira_user, jira_api_token, issue_key)
         start_at += len(comments)
 
     return all_comments
-    
-def fetch_jira_issue_xml(jira_base_url, jira_user, jira_api_token, issue_key):
-    
+
+
+def get_issue_comments(jira_base_url, jira_user, jira_api_token, issue) -> list[dict]:
+    """Return all comments of *issue*.
+
+    The search response already embeds the first page of comments in the
+    ``comment`` field, the comment endpoint is only called for the rest when
+    ``total`` is larger than what was embedded.
+    """
+    embedded = issue['fields'].get('comment')
+    if embedded is None:
+        return fetch_all_jira_comments(jira_base_url, jira_user, jira_api_token, issue['key'])
+
+    comments = embedded.get('comments', [])
+    if len(comments) >= embedded.get('total', 0):
+        return comments
+
+    cache = endpoint.cache.get_jira_cache()
+    updated = issue['fields'].get('updated')
+    remaining = cache.get('comments', issue['key'], updated) if cache else None
+    if remaining is None:
+        remaining = fetch_all_jira_comments(
+            jira_base_url, jira_user, jira_api_token, issue['key'], start_at=len(comments))
+        if cache:
+            cache.put('comments', issue['key'], updated, remaining)
+
+    return comments + remaining
+
+
+def fetch_jira_issue_xml(jira_base_url, jira_user, jira_api_token, issue_key) -> str | None:
+    """Return the issue XML of *issue_key*, or ``None`` when Jira did not return it."""
     url = f'{jira_base_url}/si/jira.issueviews:issue-xml/{issue_key}/{issue_key}.xml'
-    response = requests.get(url, headers={'Accept': 'application/xml'},
-                            auth=HTTPBasicAuth(jira_user, jira_api_token))
+    response = _jira_request('GET', url, HTTPBasicAuth(jira_user, jira_api_token),
+                             headers={'Accept': 'application/xml'})
     if response.status_code == 200:
         return response.text
     else:
-        logging.error("Failed to fetch comments for issue:",
-                      issue_key, response.status_code, response.text)
-        return []
+        logging.error(f"Failed to fetch XML for issue {issue_key}: {response.status_code} - {response.text}")
+        return None
+
+
+# Fetch the XML of many Jira issues at once
+def fetch_jira_issues_xml(jira_base_url, jira_user, jira_api_token, issue_keys, temp_max=100) -> dict[str, str]:
+    """Return the issue XML of every key in *issue_keys*, keyed by issue key.
+
+    Uses the search-request XML view for ``key in (...)``, paged with
+    ``tempMax``, and splits the result into one ``<item>`` document per
+    issue. Those can be given to ``parser.jira.parse_jira_comments_xml`` just
+    like the single issue view.
+    """
+    url = f'{jira_base_url}/sr/jira.issueviews:searchrequest-xml/temp/SearchRequest.xml'
+    jql = f"key in ({', '.join(issue_keys)})"
+    auth = HTTPBasicAuth(jira_user, jira_api_token)
+    issue_xmls = {}
+    start = 0
+
+    while True:
+        params = {'jqlQuery': jql, 'tempMax': temp_max, 'pager/start': start}
+        response = _jira_request('GET', url, auth, headers={'Accept': 'application/xml'}, params=params)
+        if response.status_code != 200:
+            logging.error(f"Failed to fetch XML for issues {issue_keys}: {response.status_code} - {response.text}")
+            break
+
+        items = ET.fromstring(response.content).findall('./channel/item')
+        for item in items:
+            issue_xmls[item.findtext('key')] = ET.tostring(item, encoding='unicode')
+
+        if len(items) < temp_max:
+            break
+        start += len(items)
+
+    return issue_xmls
+
+
+def _has_comments(issue: dict) -> bool:
+    # Without the embedded comment field we cannot tell, so assume there are some
+    comment = issue['fields'].get('comment')
+    return comment is None or comment.get('total', 0) > 0
+
+
+def iter_with_issue_xml(jira_base_url, jira_user, jira_api_token, issues, batch_size=100):
+    """Yield ``(issue, issue_xml)`` pairs for every issue in *issues*.
+
+    The XML is fetched in bulk for each batch of *batch_size* issues, and
+    only for the issues that have comments and are not in the on-disk cache.
+    ``issue_xml`` is ``None`` when no XML was fetched for the issue.
+    """
+    cache = endpoint.cache.get_jira_cache()
+    issues = iter(issues)
+    while batch := list(islice(issues, batch_size)):
+        issue_xmls = {}
+        updated = {issue['key']: issue['fields'].get('updated') for issue in batch}
+        keys = [issue['key'] for issue in batch if _has_comments(issue)]
+
+        if cache:
+            for key in keys:
+                issue_xml = cache.get('xml', key, updated[key])
+                if issue_xml is not None:
+                    issue_xmls[key] = issue_xml
+            keys = [key for key in keys if key not in issue_xmls]
+
+        if keys:
+            fetched = fetch_jira_issues_xml(
+                jira_base_url, jira_user, jira_api_token, keys, batch_size)
+            issue_xmls.update(fetched)
+            if cache:
+                for key, issue_xml in fetched.items():
+                    cache.put('xml', key, updated.get(key), issue_xml)
+
+        for issue in batch:
+            yield issue, issue_xmls.get(issue['key'])
 
 
 def get_custom_fields_from_jira(jira_base_url, jira_user, jira_api_token):
     url = f'{jira_base_url}/rest/api/3/field'
-    response = requests.get(url, headers={'Accept': 'application/json'},
-                            auth=HTTPBasicAuth(jira_user, jira_api_token))
+    response = _jira_request('GET', url, HTTPBasicAuth(jira_user, jira_api_token))
 
     if response.status_code == 200:
         fields = response.json()
@@ -104,4 +501,5 @@ def get_custom_fields_from_jira(jira_base_url, jira_user, jira_api_token):
                          for field in fields if field['custom']}
         return custom_fields
 
-    return custom_fields
+    logging.error(f"Failed to fetch Jira fields: {response.status_code} - {response.text}")
+    return {}
@@ -1,16 +1,20 @@
 
 from datetime import datetime, timedelta, timezone
+import csv
+import hashlib
 import re
-import pandas as pd
 import logging
 import os
+import requests
 from dotenv import load_dotenv
 
 import config.assignees
 from transformer import date_time_helper
 import parser.jira
+import endpoint.cache
 import endpoint.github
 import endpoint.jira
+import utils.journal
 
 load_dotenv()
 
@@ -48,20 +52,32 @@ def parse_reset_time(error_message):
     return None
 
 
-def read_csv_file():
-    df = pd.read_csv('config/list.csv')
-    return df
-
-
-def match_csv_to_jira(labels: list[str] | list[None], label_sheet: pd.DataFrame) -> list[str] | list[None]:
+def read_csv_file(path='config/list.csv') -> dict[str, tuple[str, str]]:
+    '''
+    read the label sheet once, keyed by the casefolded label: (label as written in the csv file, colour).
+    only the labels flagged to be created in GitHub are used.
+    '''
+    label_sheet = {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            label = row.get('Labels') or ''
+            if not label.strip() or (row.get('Oprettes i GitHub') or '').strip().upper() != 'JA':
+                continue
+            color = (row.get('Farvekode') or '').strip().lstrip('#') or endpoint.github.DEFAULT_LABEL_COLOR
+            label_sheet.setdefault(label.casefold(), (label, color))
+    return label_sheet
+
+
+def match_csv_to_jira(labels: list[str] | list[None], label_sheet: dict[str, tuple[str, str]]) -> list[str] | list[None]:
     '''
-    compare lowercase jira labels with the lowercase github labels in the csv file.
-    then return matching labels from the csv file with original case, not lowercase.
+    compare the casefolded jira labels with the casefolded github labels in the csv file.
+    then return matching labels from the csv file with original case, not casefolded.
     '''
-    labels_lowercase = [label.lower() for label in labels] 
-    label_sheet["Labels_lowercase"] = label_sheet.Labels.str.lower()
-    idx_label_match = label_sheet.Labels_lowercase.isin(labels_lowercase)
-    csv_labels = label_sheet[idx_label_match].Labels.to_list()
+    csv_labels = []
+    for label in labels:
+        match = label_sheet.get(label.casefold())
+        if match and match[0] not in csv_labels:
+            csv_labels.append(match[0])
 
     if len(labels) > 0 and len(csv_labels) == 0:
         logging.warning(
@@ -70,30 +86,157 @@ def match_csv_to_jira(labels: list[str] | list[None], label_sheet: pd.DataFrame)
     return csv_labels
 
 
+# Jira status -> (closed in GitHub, label to add)
+ISSUE_STATUSES = {
+    'Reopened': (False, 'Reopened'),
+    'Closed': (True, None),
+    'Onhold': (True, 'Onhold'),
+    'On Hold': (True, 'Onhold'),
+    'Resolved': (False, 'Resolved'),
+    'Open': (False, None),
+}
+
+# The Jira fields the labels are built from
+LABEL_FIELDS = ('labels', 'priority', 'reporter', 'status', 'issuetype')
+
+
+def validate_assignees(github_repo, github_token, assignees: dict[str, str]) -> dict[str, str]:
+    '''
+    keep only the assignees whose GitHub login can be assigned in the repo.
+    an import with an unassignable login fails after it was accepted, those assignees
+    end up on the "Assignee:" line of the description instead.
+    '''
+    assignable = endpoint.github.list_assignable_users(github_repo, github_token)
+    valid = {}
+    for name, login in assignees.items():
+        if login.casefold() in assignable:
+            valid[name] = login
+        else:
+            logging.warning(f"GitHub user '{login}' ({name}) cannot be assigned in {github_repo}, not assigning issues to them")
+    return valid
+
+
+def build_label_list(issue_fields: dict, label_sheet: dict[str, tuple[str, str]]) -> list[str]:
+    '''
+    build the GitHub labels of an issue: the matching labels from the csv file, the priority,
+    the reporter, a label for some statuses and "bug" for bugs.
+    '''
+    # Comparing the labels from the response with the labels in the csv file
+    label_list = match_csv_to_jira(issue_fields.get('labels', []), label_sheet)
+
+    # Appending the issue priority and owner to the label list as per requirement
+    label_list.append(issue_fields['priority']['name'])
+    label_list.append(issue_fields['reporter']['displayName'])
+
+    _, status_label = ISSUE_STATUSES.get(issue_fields['status']['name'], (False, None))
+    if status_label:
+        label_list.append(status_label)
+
+    if issue_fields['issuetype']['name'] == 'Bug':
+        label_list.append('bug')
+
+    return label_list
+
+
+def provision_labels(github_repo, github_token, issues: list[dict], label_sheet: dict[str, tuple[str, str]], journal):
+    '''
+    create every label the issues need in GitHub before their imports start, with the colour from the csv file.
+    labels that an earlier run provisioned are not checked again.
+    '''
+    needed = {}
+    for issue in issues:
+        for label in build_label_list(issue['fields'], label_sheet):
+            _, color = label_sheet.get(label.casefold(), (label, endpoint.github.DEFAULT_LABEL_COLOR))
+            needed.setdefault(label, color)
+
+    provisioned = journal.provisioned_labels()
+    needed = {label: color for label, color in needed.items() if label.casefold() not in provisioned}
+    if not needed:
+        logging.info("All labels these issues need were provisioned already")
+        return
+
+    journal.record_labels(endpoint.github.provision_labels(github_repo, github_token, needed))
+
+
+def record_migration_result(journal, issue_key, updated, result, description_hash=None):
+    # Keep track of what has been migrated for resuming and for the next incremental run
+    if isinstance(result, endpoint.github.IncompleteImport):
+        journal.record_incomplete(issue_key, result.issue_number, updated, result.posted, str(result))
+    elif result:
+        journal.record_imported(issue_key, result, updated, description_hash)
+    else:
+        journal.record_failed(issue_key, updated)
+
+
+def import_result(future):
+    # An issue missing some of its comments was still created
+    error = future.exception()
+    if isinstance(error, endpoint.github.IncompleteImport):
+        return error
+    if error:
+        raise error
+    return future.result()
+
+
 # Migrate Jira issues to GitHub
 
 
-def migrate_jira_to_github(jira_base_url, jira_user, jira_api_token, github_repo, github_token, jql, assignees):
-    # Step 1: Fetch Jira Issues
-    jira_issues = endpoint.jira.fetch_jira_issues(
-        jira_base_url, jira_user, jira_api_token, jql)
+def migrate_jira_to_github(jira_base_url, jira_user, jira_api_token, github_repo, github_token, jql, assignees,
+                           journal, incremental=False):
+    # Step 0: The journal knows the high-water mark and what earlier runs already migrated
+    search_jql = jql
+    previous_mark = journal.high_water_mark(jql)
+    if incremental and previous_mark:
+        search_jql = utils.journal.narrow_jql(jql, previous_mark)
+        logging.info(f"Incremental run, only migrating issues updated since {previous_mark}")
+
+    # Index the issues already in the repo by Jira key, this also catches issues the journal does not know about
+    github_index = endpoint.github.index_github_issues(github_repo, github_token)
+
+    # Drop the GitHub logins that would make the imports fail
+    assignees = validate_assignees(github_repo, github_token, assignees)
 
-    # Step 2: Read csv file
+    # Step 1: Read csv file, the labels are created per page of issues before those are loaded
     label_sheet = read_csv_file()
 
+    # Step 2: Stream the full Jira Issues, listed with only the fields needed for their labels and
+    # loaded in parallel chunks, the first issues are migrated while later pages are still being listed.
+    # Issues Jira cannot load are journaled as failed, so the high-water mark stays before them
+    jira_issues = endpoint.jira.iter_jira_issues(
+        jira_base_url, jira_user, jira_api_token, search_jql, stub_fields=('updated',) + LABEL_FIELDS,
+        on_page=lambda stubs: provision_labels(github_repo, github_token, stubs, label_sheet, journal),
+        on_failed=lambda stub, error: journal.record_failed(stub['key'], stub['fields']['updated'], error))
+
     # Step 3: Process custom fields
     fields = endpoint.jira.get_custom_fields_from_jira(
         jira_base_url, jira_user, jira_api_token)
 
-    github_issue_numbers = []
+    # Imports are submitted without waiting for GitHub to finish them, the results come back as futures
+    import_tracker = endpoint.github.ImportTracker(github_repo, github_token)
+    import_futures = []
     # Step 4: Iterate through each issue and create GitHub issues
-    total_issues = len(jira_issues)
-    logging.info(f"Starting migration of {total_issues} Jira issues to GitHub")
-    for idx, issue in enumerate(jira_issues, start=1): 
+    logging.info("Starting migration of Jira issues to GitHub")
+    # The issue XML (used for the media in comments) is fetched in bulk per batch of issues
+    issues_with_xml = endpoint.jira.iter_with_issue_xml(
+        jira_base_url, jira_user, jira_api_token, jira_issues)
+    for idx, (issue, issue_xml) in enumerate(issues_with_xml, start=1): 
         # if issue["key"] not in ("JAR-1375"):
         #     continue
         logging.info(
-            f"Processing Jira issue {idx}/{total_issues}: {issue.get('key', '')}")
+            f"Processing Jira issue {idx}: {issue.get('key', '')}")
+
+        journal.record_fetched(issue['key'], issue['fields']['updated'])
+        entry = journal.get(issue['key'])
+        existing_number = entry['issue_number'] or github_index.get(issue['key'])
+        # When only GitHub knows the issue it is unknown up to when it was synced
+        synced = entry['updated'] if entry['issue_number'] else None
+        # Issues that reached GitHub earlier are skipped, unless they changed and this is an incremental run
+        # or they are still missing comments
+        if existing_number and entry['overflow_posted'] is None and not (incremental and synced != issue['fields']['updated']):
+            logging.info(f"Issue {issue['key']} was already migrated as #{existing_number}, skipping")
+            if not entry['issue_number']:
+                journal.record_imported(issue['key'], existing_number, issue['fields']['updated'])
+            continue
         description = []
         issue_title = "[" + issue['key'] + "] " + issue['fields']['summary']
 
@@ -101,9 +244,6 @@ def migrate_jira_to_github(jira_base_url, jira_user, jira_api_token, github_repo
         issue_description = parser.jira.parse_jira_description(
             issue['fields'].get('description', 'No description found'))
 
-        # Getting owners name from response
-        issue_owner = issue['fields']['reporter']['displayName']
-
         if type(issue['fields']['assignee']) == dict:
             # Getting assignee name from response
             issue_assignee = issue['fields']['assignee']['displayName'].strip()
@@ -148,65 +288,51 @@ def migrate_jira_to_github(jira_base_url, jira_user, jira_api_token, github_repo
 
         # Converting from list to string
         final_description = "\n".join([str(item) for item in description])
+        # Journaled, so an update only touches the description comments when it changed
+        description_hash = hashlib.sha256(final_description.encode('utf-8')).hexdigest()
 
-        # Getting issue labels from response
-        issue_labels = issue['fields'].get('labels', [])
-
-        # Comparing the labels from the response with the labels in the csv file
-        label_list = match_csv_to_jira(
-            issue_labels, label_sheet)
-
-        # Getting issue priority from response
-        issue_priority = issue['fields']['priority']['name']
-
-        # Appending the issue priority to the label list as per requirement
-        label_list.append(issue_priority)
+        # The labels were created in GitHub up front, see provision_labels
+        label_list = build_label_list(issue['fields'], label_sheet)
 
-        # Appending the issue owner to the label list as per requirement
-        label_list.append(issue_owner)
-
-        # Getting issue status from response
+        # Based on the status the GitHub issue is closed or not
         issue_status = issue['fields']['status']['name']
-        issue_closed: bool = None
-
-        # Based on different status we set the issue status to True or False and append the status to the label list
-        if issue_status == 'Reopened':
-            issue_closed = False
-            label_list.append('Reopened')
-        elif issue_status == 'Closed':
-            issue_closed = True
-        elif issue_status in ['Onhold','On Hold']:
-            issue_closed = True
-            label_list.append('Onhold')
-        elif issue_status == 'Resolved':
-            issue_closed = False
-            label_list.append('Resolved')
-        elif issue_status == 'Open':
-            issue_closed = False
-        else:
-            issue_closed = False
+        if issue_status not in ISSUE_STATUSES:
             logging.warning(f"Unknown issue status '{issue_status}' for issue {issue['key']}. Defaulting to 'Open'.")
-
-        # Getting the type of issue from response e.g. "Bug" or "Task"
-        issue_type = issue['fields']['issuetype']['name']
+        issue_closed, _ = ISSUE_STATUSES.get(issue_status, (False, None))
 
         # Fetching the comments from the issue
-        issue_comments = endpoint.jira.fetch_all_jira_comments(
-            jira_base_url, jira_user, jira_api_token, issue['key'])
-        issue_xml = endpoint.jira.fetch_jira_issue_xml(jira_base_url, jira_user, jira_api_token, issue['key'])
-        df_comments_media = parser.jira.parse_jira_comments_xml(issue_xml)
+        try:
+            issue_comments = endpoint.jira.get_issue_comments(
+                jira_base_url, jira_user, jira_api_token, issue)
+        except requests.exceptions.RequestException as e:
+            # E.g. no permission or the issue was deleted during the run, the other issues carry on
+            journal.record_failed(issue['key'], issue['fields']['updated'], f"Fetching comments failed: {e}")
+            continue
+
+        # The XML is only needed to find the media in the comments
+        comments_media = {}
+        if issue_comments:
+            if issue_xml is None:
+                # Not part of the bulk XML, fetch it on its own
+                issue_xml = endpoint.jira.fetch_jira_issue_xml(
+                    jira_base_url, jira_user, jira_api_token, issue['key'])
+            if issue_xml is not None:
+                comments_media = parser.jira.parse_jira_comments_xml(issue_xml)
+            else:
+                # The comments are still migrated, only without their media
+                logging.warning(f"No XML for issue {issue['key']}, its comments are migrated without media")
 
         # Parsing the comments to get the created date and format them
         comment_created_date = []
         formatted_comments = []
         # Formatting the comments to be added to the issue
         for comment in issue_comments:
-            df_comment_medias = df_comments_media[df_comments_media.comment_id == comment["id"]].iloc[0]
-            formatted_comments.append(parser.jira.format_jira_comment(comment, df_comment_medias))
+            media_record = comments_media.get(comment['id'])
+            if media_record is None:
+                logging.warning(f"Comment {comment['id']} of issue {issue['key']} is not in the issue XML, its media are left out")
+            formatted_comments.append(parser.jira.format_jira_comment(comment, media_record))
             comment_created_date.append(
                 date_time_helper.convert_jira_to_github_datetime_format(comment['created']))
-        if issue_type == 'Bug':
-            label_list.append('bug')
 
         comments_list = []
         for i in range(len(formatted_comments)):
@@ -214,9 +340,57 @@ def migrate_jira_to_github(jira_base_url, jira_user, jira_api_token, github_repo
                 "body": formatted_comments[i],
                 "created_at": comment_created_date[i]
             })
-        issue_number = endpoint.github.create_github_issue(
-            github_repo, github_token, issue_title, final_description, login_user, label_list, issue_closed, issue_created, comments_list)
-        github_issue_numbers.append(issue_number)
+
+        journal.record_rendered(issue['key'])
+
+        def on_done(future, key=issue['key'], updated=issue['fields']['updated'], description_hash=description_hash):
+            record_migration_result(journal, key, updated, import_result(future), description_hash)
+
+        if entry['overflow_posted'] is not None:
+            # Imported before without all of its comments, add the rest. The issue stays at its
+            # old sync point, so a later incremental run still brings any other change over
+            import_futures.append(import_tracker.complete(
+                entry['issue_number'], entry['overflow_posted'],
+                issue_title, final_description, login_user, label_list, issue_closed, issue_created, comments_list,
+                callback=lambda future, key=issue['key'], updated=entry['updated']: on_done(future, key, updated, None)))
+        elif existing_number:
+            # Migrated before and changed since, update it with the comments added after the last sync
+            if synced:
+                since = date_time_helper.convert_jira_to_github_datetime_format(synced)
+                new_comments = [c for c in comments_list if c['created_at'] > since]
+            else:
+                # Without a sync point adding comments could duplicate the imported ones
+                new_comments = []
+            issue_number = endpoint.github.update_github_issue(
+                github_repo, github_token, existing_number, issue_title, final_description, login_user, label_list, issue_closed, new_comments,
+                description_changed=description_hash != entry['description_hash'])
+            record_migration_result(journal, issue['key'], issue['fields']['updated'], issue_number, description_hash)
+        elif entry['stage'] == 'submitted':
+            # The import was submitted before the last run stopped, wait for it instead of importing again
+            import_futures.append(import_tracker.resume(
+                entry['import_id'], entry['submitted_at'],
+                issue_title, final_description, login_user, label_list, issue_closed, issue_created, comments_list,
+                callback=on_done))
+        else:
+            import_futures.append(import_tracker.submit(
+                issue_title, final_description, login_user, label_list, issue_closed, issue_created, comments_list,
+                callback=on_done,
+                on_submitted=lambda import_id, key=issue['key']: journal.record_submitted(key, import_id)))
+
+    # Wait for the imports that are still pending
+    import_tracker.close()
+    github_issue_numbers = []
+    for future in import_futures:
+        result = import_result(future)
+        github_issue_numbers.append(
+            result.issue_number if isinstance(result, endpoint.github.IncompleteImport) else result)
+
+    journal.commit(jql)
+
+    cache = endpoint.cache.get_jira_cache()
+    if cache:
+        logging.info(f"Jira cache: {cache.hits} hits, {cache.misses} misses")
+    logging.info(f"GitHub write window: {endpoint.github.github_write_controller.current_window}")
 
     return github_issue_numbers
 
@@ -240,6 +414,8 @@ if __name__ == "__main__":
     GH_TOKEN = os.getenv('GH_TOKEN')
     PROJECT_KEY = os.getenv('PROJECT_KEY')
     JQL = os.getenv('JQL')
+    INCREMENTAL = os.getenv('INCREMENTAL', '').lower() in ('1', 'true', 'yes')
+    MIGRATION_JOURNAL = os.getenv('MIGRATION_JOURNAL', 'migration_journal.sqlite3')
 
     if PROJECT_KEY is None:
         raise ValueError("PROJECT_KEY environment variable is not set.")
@@ -250,13 +426,19 @@ if __name__ == "__main__":
     projects = endpoint.github.list_projects(GH_REPO, GH_TOKEN)
     project_id = get_project_id(projects, project_name=PROJECT_KEY)
 
+    # Every stage of every issue is journaled, a new run resumes where the last one stopped
+    journal = utils.journal.MigrationJournal(MIGRATION_JOURNAL)
+
     # Function tp start the migration process
     github_issue_numbers = migrate_jira_to_github(
-        JIRA_BASE_URL, JIRA_USER, JIRA_API_TOKEN, GH_REPO, GH_TOKEN, JQL, config.assignees.ASSIGNEES)
-
-    # Add the issues to the GitHub project
-    for issue_number in github_issue_numbers:
-        if issue_number:
-            
-            endpoint.github.add_issue_to_project(
-                GH_REPO, GH_TOKEN, project_id, issue_number)
+        JIRA_BASE_URL, JIRA_USER, JIRA_API_TOKEN, GH_REPO, GH_TOKEN, JQL, config.assignees.ASSIGNEES,
+        journal, incremental=INCREMENTAL)
+
+    # Add the issues to the GitHub project (in batches, two GraphQL calls per batch),
+    # including the ones imported by an earlier run that stopped before this step
+    added = endpoint.github.add_issues_to_project(
+        GH_REPO, GH_TOKEN, project_id, journal.issue_numbers_not_in_project())
+    journal.record_in_project(added)
+
+    journal.log_throughput()
+    journal.close()
@@ -0,0 +1,415 @@
+import logging
+import re
+from datetime import datetime, timezone
+
+# Plain text "@name" would mention GitHub users that are not part of the repo
+_MENTION_RE = re.compile(r'(?<!\w)@(?=\w)')
+
+# Inline marks in the order they are applied, innermost first
+_MARK_RANK = {mark: rank for rank, mark in enumerate(('code', 'strong', 'em', 'strike', 'underline', 'link'))}
+
+# Marks that wrap the text in a Markdown marker
+_MARK_MARKERS = {'code': '`', 'strong': '**', 'em': '*', 'strike': '~~'}
+
+
+def _pasted_markup(content) -> str | None:
+    """The raw text of a paragraph that is markup pasted as text (e.g. XML), before any marks are applied."""
+    text = ''.join(item.get('text', '') if item.get('type') == 'text' else '\n'
+                   for item in content if item.get('type') in ('text', 'hardBreak')).strip()
+    return text if text.endswith('>') else None
+
+
+def _flat_paragraph(content, prefix: str) -> str | None:
+    """The trimmed Markdown of a paragraph of text, hard breaks, mentions and cards, None if it has anything else.
+
+    Same output as going through ``MarkdownRenderer.inlines`` outside of a
+    table, without a method call per node. *prefix* goes after every line break.
+    """
+    markdown = ''
+    try:
+        for item in content:
+            item_type = item['type']
+            if item_type == 'text':
+                text = item['text']
+                if 'marks' in item or '@' in text:
+                    text = _inline_text(text, item['marks'] if 'marks' in item else None)
+                markdown += text
+            elif item_type == 'hardBreak':
+                markdown += '\n'
+            elif item_type == 'mention':
+                markdown += item['attrs']['text'].lstrip('@')
+            elif item_type == 'inlineCard':
+                markdown += f"[Link]({item['attrs']['url']})"
+            else:
+                return None
+    except KeyError:
+        # Incomplete nodes are left to the renderer
+        return None
+    if '<' in markdown and content[0]['type'] == 'text' and content[0]['text'].lstrip().startswith('<'):
+        # Maybe markup pasted as text, see MarkdownRenderer.paragraph
+        return None
+    if prefix and '\n' in markdown:
+        markdown = markdown.replace('\n', '\n' + prefix)
+    return markdown.strip()
+
+
+def _inline_text(text: str, marks) -> str:
+    """The Markdown of a text node with *marks*."""
+    # Only a standalone "@name" is dropped, e-mail addresses and code (e.g. @Override) are kept
+    if '@' in text and not (marks and any(mark.get('type') == 'code' for mark in marks)):
+        text = _MENTION_RE.sub('', text)
+    if marks:
+        if len(marks) > 1:
+            marks = sorted(marks, key=lambda mark: _MARK_RANK.get(mark.get('type'), 0))
+        for mark in marks:
+            mark_type = mark.get('type')
+            marker = _MARK_MARKERS.get(mark_type)
+            if marker:
+                core = text.strip()
+                if len(core) == len(text):
+                    text = marker + core + marker
+                else:
+                    text = _wrap(text, marker)
+            elif mark_type == 'underline':
+                # HTML underline is fine for GFM
+                text = f'<ins>{text}</ins>'
+            elif mark_type == 'link':
+                href = (mark.get('attrs') or {}).get('href', '')
+                text = f'[{text}]({href})'
+    return text
+
+
+def _wrap(text: str, marker: str) -> str:
+    """
+    Wrap only the 'core' of the text in marker, preserving whitespace.
+    e.g. _wrap("  foo  ", "*") -> "  *foo*  "
+    """
+    core = text.strip()
+    if not core:
+        return text
+    if len(core) == len(text):
+        return f"{marker}{core}{marker}"
+    lead = len(text) - len(text.lstrip())
+    trail = len(text.rstrip())
+    return f"{text[:lead]}{marker}{core}{marker}{text[trail:]}"
+
+
+class MarkdownRenderer:
+    """Render an Atlassian Document Format (ADF) tree as GitHub-flavored Markdown.
+
+    The tree is walked once. Every node type has a handler in ``BLOCKS`` or
+    ``INLINES`` and all output goes into a single buffer that is joined at
+    the end. Nesting (lists, blockquotes, panels) is handled with a line
+    prefix that is written after every newline, so nested lists, tables and
+    code blocks work anywhere.
+
+    *media_links* are the Markdown links for the media nodes, in document
+    order. ADF only references media by id, the links come from the issue
+    XML (see ``parser.jira.format_jira_comment``).
+    """
+
+    __slots__ = ('out', 'prefix', 'in_table', 'media_links')
+
+    def __init__(self, media_links=None):
+        self.out = []
+        self.prefix = ''
+        self.in_table = False
+        self.media_links = iter(media_links or ())
+
+    def render(self, node) -> str:
+        if node.get('type') == 'doc':
+            self.blocks(node.get('content', []))
+        else:
+            self.blocks([node])
+        return ''.join(self.out).strip()
+
+    # Output helpers
+
+    def write(self, text: str) -> None:
+        if '\n' in text:
+            lines = text.split('\n')
+            self.out.append(lines[0])
+            for line in lines[1:]:
+                self.newline()
+                self.out.append(line)
+        else:
+            self.out.append(text)
+
+    def newline(self) -> None:
+        # Table cells have to stay on one line
+        self.out.append('<br>' if self.in_table else '\n' + self.prefix)
+
+    def blocks(self, nodes, tight=False) -> None:
+        """Render block *nodes*, separated by a blank line (a newline when *tight*)."""
+        out = self.out
+        handlers = self.BLOCKS
+        if self.in_table:
+            separator = '<br>'
+        elif tight:
+            separator = '\n' + self.prefix
+        else:
+            separator = '\n' + self.prefix.rstrip() + '\n' + self.prefix
+
+        in_table = self.in_table
+        prefix = self.prefix
+        first = True
+        for node in nodes:
+            node_type = node.get('type')
+            if node_type == 'paragraph' and not in_table:
+                # Most blocks are paragraphs of text
+                text = _flat_paragraph(node.get('content', []), prefix)
+                if text is not None:
+                    if text:
+                        if not first:
+                            out.append(separator)
+                        out.append(text)
+                        first = False
+                    continue
+            start = len(out)
+            if not first:
+                out.append(separator)
+            content_start = len(out)
+            handler = handlers.get(node_type)
+            if handler:
+                handler(self, node)
+            elif node_type in self.INLINES:
+                self.inlines([node])
+            elif 'content' in node:
+                # Unknown container, its content is still worth keeping
+                self.blocks(node['content'])
+            else:
+                logging.info("ADF node type '%s' not supported, skipping it", node.get('type'))
+            if len(out) == content_start:
+                # Nothing was written, drop the separator as well
+                del out[start:]
+            else:
+                first = False
+
+    def inlines(self, nodes) -> None:
+        handlers = self.INLINES_IN_TABLE if self.in_table else self.INLINES
+        append = self.out.append
+        for node in nodes:
+            node_type = node.get('type')
+            if node_type == 'text' and 'marks' not in node:
+                # Plain text is by far the most common node, skip the dispatch for it
+                text = node.get('text', '')
+                if '@' not in text and '\n' not in text and '|' not in text:
+                    append(text)
+                    continue
+            handler = handlers.get(node_type)
+            if handler:
+                handler(self, node)
+            elif 'content' in node:
+                self.inlines(node['content'])
+            else:
+                logging.info("ADF node type '%s' not supported, skipping it", node.get('type'))
+
+    # Block nodes
+
+    def paragraph(self, node) -> None:
+        content = node.get('content', [])
+        out = self.out
+        if not self.in_table:
+            # Most paragraphs are only text, rendered without the dispatch
+            text = _flat_paragraph(content, self.prefix)
+            if text is not None:
+                if text:
+                    out.append(text)
+                return
+            if content and content[0].get('text', '').lstrip().startswith('<'):
+                markup = _pasted_markup(content)
+                if markup:
+                    # Markup pasted as text would be swallowed by GitHub, show it as code
+                    self.write(f'```\n{markup}\n```')
+                    return
+
+        start = len(out)
+        self.inlines(content)
+        if len(out) - start == 1:
+            # Plain text paragraphs come out as one piece
+            text = out[-1].strip()
+            if text:
+                out[-1] = text
+            else:
+                del out[-1]
+        elif len(out) > start:
+            # Trim the whitespace around the paragraph, joined into one piece
+            text = ''.join(out[start:]).strip()
+            del out[start:]
+            if text:
+                out.append(text)
+
+    def heading(self, node) -> None:
+        level = node.get('attrs', {}).get('level', 1)
+        self.out.append('#' * level + ' ')
+        self.inlines(node.get('content', []))
+
+    def rule(self, node) -> None:
+        self.out.append('---')
+
+    def bullet_list(self, node) -> None:
+        self.list_items(node.get('content', []), None)
+
+    def ordered_list(self, node) -> None:
+        self.list_items(node.get('content', []), (node.get('attrs') or {}).get('order', 1))
+
+    def list_items(self, items, order) -> None:
+        """Render list *items*, numbered from *order* or bulleted when it is None."""
+        out = self.out
+        outer = self.prefix
+        in_table = self.in_table
+        separator = '<br>' if in_table else '\n' + outer
+        item_marker = '* '
+        # Everything after the first line of an item lines up with the text after the marker
+        prefix = outer + '  '
+        for index, item in enumerate(items):
+            if index:
+                out.append(separator)
+            if order is not None:
+                item_marker = f'{order + index}. '
+                prefix = outer + ' ' * len(item_marker)
+            content = item.get('content', [])
+            if len(content) == 1 and not in_table and content[0].get('type') == 'paragraph':
+                # Most items are a single paragraph of text
+                text = _flat_paragraph(content[0].get('content', []), prefix)
+                if text is not None:
+                    out.append(item_marker + text)
+                    continue
+            out.append(item_marker)
+            self.prefix = prefix
+            if len(content) == 1 and content[0].get('type') == 'paragraph':
+                self.paragraph(content[0])
+            else:
+                self.blocks(content, tight=True)
+        self.prefix = outer
+
+    def blockquote(self, node) -> None:
+        outer = self.prefix
+        self.prefix = outer + '> '
+        self.out.append('> ')
+        self.blocks(node.get('content', []))
+        self.prefix = outer
+
+    def code_block(self, node) -> None:
+        language = (node.get('attrs') or {}).get('language') or ''
+        self.write(f'```{language}\n')
+        for item in node.get('content', []):
+            self.write(item.get('text', ''))
+        self.write('\n```')
+
+    def table(self, node) -> None:
+        rows = node.get('content', [])
+        width = max((len(row.get('content', [])) for row in rows), default=0)
+        if not width:
+            return
+        for index, row in enumerate(rows):
+            if index:
+                self.newline()
+            self.out.append('|')
+            cells = row.get('content', [])
+            for cell in cells:
+                self.out.append(' ')
+                self.in_table = True
+                self.blocks(cell.get('content', []))
+                self.in_table = False
+                self.out.append(' |')
+            self.out.append(' |' * (width - len(cells)))
+            if index == 0:
+                # The first row is the header
+                self.newline()
+                self.out.append('|' + ' --- |' * width)
+
+    def media(self, node) -> None:
+        link = next(self.media_links, None)
+        if link:
+            self.out.append(link)
+
+    def media_group(self, node) -> None:
+        # Several files next to each other, one per line (captions are left out)
+        items = [item for item in node.get('content', []) if item.get('type') == 'media']
+        for index, item in enumerate(items):
+            if index:
+                self.newline()
+            self.media(item)
+
+    def panel(self, node) -> None:
+        # Info, note and warning panels become quotes
+        self.blockquote(node)
+
+    def expand(self, node) -> None:
+        title = (node.get('attrs') or {}).get('title')
+        if title:
+            self.out.append(f'**{title}**')
+            self.newline()
+            self.newline()
+        self.blocks(node.get('content', []))
+
+    # Inline nodes
+
+    def text(self, node) -> None:
+        text = _inline_text(node.get('text', ''), node.get('marks'))
+        if '\n' in text:
+            self.write(text)
+        else:
+            self.out.append(text)
+
+    def table_text(self, node) -> None:
+        # A pipe would end the table cell
+        self.text({**node, 'text': node.get('text', '').replace('|', '\\|')})
+
+    def hard_break(self, node) -> None:
+        self.newline()
+
+    def mention(self, node) -> None:
+        # Not using "@" because it would mention GitHub users that are not part of the repo
+        self.out.append(node.get('attrs', {}).get('text', '').lstrip('@'))
+
+    def emoji(self, node) -> None:
+        attrs = node.get('attrs', {})
+        self.out.append(attrs.get('text') or attrs.get('shortName', ''))
+
+    def inline_card(self, node) -> None:
+        url = node.get('attrs', {}).get('url', '')
+        self.out.append(f'[Link]({url})')
+
+    def status(self, node) -> None:
+        self.out.append(f"`{node.get('attrs', {}).get('text', '')}`")
+
+    def date(self, node) -> None:
+        timestamp = int(node.get('attrs', {}).get('timestamp', 0)) / 1000
+        self.out.append(datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d'))
+
+    BLOCKS = {
+        'paragraph': paragraph,
+        'heading': heading,
+        'rule': rule,
+        'bulletList': bullet_list,
+        'orderedList': ordered_list,
+        'blockquote': blockquote,
+        'codeBlock': code_block,
+        'table': table,
+        'mediaSingle': media_group,
+        'mediaGroup': media_group,
+        'media': media,
+        'panel': panel,
+        'expand': expand,
+        'nestedExpand': expand,
+    }
+
+    INLINES = {
+        'text': text,
+        'hardBreak': hard_break,
+        'mention': mention,
+        'emoji': emoji,
+        'inlineCard': inline_card,
+        'mediaInline': media,
+        'status': status,
+        'date': date,
+    }
+
+    INLINES_IN_TABLE = {**INLINES, 'text': table_text}
+
+
+def render_adf(node, media_links=None) -> str:
+    """Render an ADF document (or a single node) as Markdown, see ``MarkdownRenderer``."""
+    return MarkdownRenderer(media_links).render(node)
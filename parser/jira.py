@@ -1,186 +1,45 @@
+import io
 import logging
-import xml.etree.ElementTree as ET
 import os
-import html
 import re
-from bs4 import BeautifulSoup
-import pandas as pd
+import lxml.html
+from lxml import etree
 
 import config.custom_fields_to_use
+import parser.adf
 
 # Parse Jira issue description
-def parse_jira_description(description: list[str]) -> str:
+def parse_jira_description(description: dict | str | None) -> str:
     # Handle None or empty description
     if not description:
         return "No description provided"
-        
+
     # Handle string descriptions (fallback)
     if isinstance(description, str):
         return description
-        
-    result = []
-    
+
     try:
-        if ('type' in description and 
-            description['type'] == 'doc' and 
-            'content' in description):
-            for block in description['content']:
-                if 'type' in block:
-                    if block['type'] == 'paragraph':
-                        paragraph_text = ''
-                        for i, text_node in enumerate(block.get('content', [])):
-                            if 'type' in text_node and text_node['type'] == 'text':
-                                text = text_node.get('text', '')
-                                # Handle angle brackets directly
-                                #text = process_code_block(text)
-                                if text == '' or (text == " " and 'marks' in text_node and text_node['marks']):
-                                    continue  # Skip this node
-                                 # Check if this paragraph should be treated as code
-                                formatted_text = ''
-                                # Checking markings
-                                if 'marks' in text_node:
-                                    for mark in text_node['marks']:
-                                        if mark.get('type') == 'strong':
-                                            formatted_text += f'**{text.strip()}**'  # Bold
-                                        elif mark.get('type') == 'em':
-                                            formatted_text += f'*{text.strip()}*'  # Italics
-                                        elif mark.get('type') == 'link':
-                                            href = mark['attrs'].get('href', '')
-                                            formatted_text += f'[{text.strip()}]({href})'  # Link
-                                    if formatted_text:
-                                        paragraph_text += formatted_text
-                                    else:
-                                        paragraph_text += text  # Append plain text if no formatting was applied
-                                else:
-                                    paragraph_text += text  # Append plain text
-                                
-                                if i < len(block['content']) - 1:
-                                    paragraph_text += ' '  # Add space after text if not the last node
-                            elif 'type' in text_node and text_node['type'] == 'hardBreak':
-                                paragraph_text += '\n'  # Add a new line for hard break
-                            elif text_node['type'] == 'inlineCard':
-                                url = text_node['attrs'].get('url', '')
-                                paragraph_text += f' [JAR]({url})'  # Add link as markdown for inlineCard
-                        if paragraph_text.startswith('<') and paragraph_text.endswith('>'):
-                            result.append(f'```\n{paragraph_text.strip()}\n```\n')
-                        elif paragraph_text.strip():
-                            result.append(paragraph_text.strip())
-                            result.append('')
-                        
-                    elif block['type'] == 'heading':
-                        heading_text = ''
-                        for text_node in block.get('content', []):
-                            if 'type' in text_node and text_node['type'] == 'text':
-                                heading_text += text_node.get('text', '')
-                        level = block.get('attrs', {}).get('level', 1)
-                        result.append('#' * level + ' ' + heading_text.strip())
-                    elif block['type'] == 'rule':
-                        result.append('---')  # Horizontal Rule (Markdown)
-                    elif block['type'] == 'bulletList':
-                        for list_item in block.get('content', []):
-                            if list_item['type'] == 'listItem':
-                                list_item_text = ''
-                                for item_content in list_item.get('content', []):
-                                    if item_content['type'] == 'paragraph':
-                                        for text_node in item_content.get('content', []):
-                                            if 'type' in text_node and text_node['type'] == 'text':
-                                                text = text_node.get('text', '').rstrip()  # Trim right spaces
-                                                if text == '' or (text == " " and 'marks' in text_node and text_node['marks']):
-                                                    continue  # Skip this node
-                                                formatted_text = ''
-                                                # Checking for marks
-                                                if 'marks' in text_node:
-                                                    for mark in text_node['marks']:
-                                                        if mark.get('type') == 'strong':
-                                                            formatted_text += f'**{text.strip()}**'  # Bold
-                                                        elif mark.get('type') == 'em':
-                                                            formatted_text += f'*{text.strip()}*'  # Italics
-                                                        elif mark.get('type') == 'link':
-                                                            href = mark['attrs'].get('href', '')
-                                                            formatted_text += f'[{text.strip()}]({href})'  # Link
-                                                    list_item_text += formatted_text if formatted_text else text  # Use formatted or plain
-                                                else:
-                                                    list_item_text += text  # Append plain text
-
-                                            # Handle inlineCard
-                                            elif text_node['type'] == 'inlineCard':
-                                                url = text_node['attrs'].get('url', '')
-                                                list_item_text += f' [Link]({url})'  # Add link as markdown for inlineCard
-
-                                if list_item_text.strip():  # Only add non-empty list items
-                                    result.append(f'* {list_item_text.strip()}')  # Add bullet point
-                    elif block['type'] == 'orderedList':
-                        order = block.get('attrs', {}).get('order', 1)  # Get the starting order number
-                        for index, list_item in enumerate(block.get('content', [])):
-                            if list_item['type'] == 'listItem':
-                                list_item_text = ''
-                                for item_content in list_item.get('content', []):
-                                    if item_content['type'] == 'paragraph':
-                                        for text_node in item_content.get('content', []):
-                                            if 'type' in text_node and text_node['type'] == 'text':
-                                                text = text_node.get('text', '').rstrip()  # Trim right spaces
-                                                if text == '' or (text == " " and 'marks' in text_node and text_node['marks']):
-                                                    continue  # Skip this node
-                                                formatted_text = ''
-                                                # Checking for marks
-                                                if 'marks' in text_node:
-                                                    for mark in text_node['marks']:
-                                                        if mark.get('type') == 'strong':
-                                                            formatted_text += f'**{text.strip()}**'  # Bold
-                                                        elif mark.get('type') == 'em':
-                                                            formatted_text += f'*{text.strip()}*'  # Italics
-                                                        elif mark.get('type') == 'link':
-                                                            href = mark['attrs'].get('href', '')
-                                                            formatted_text += f'[{text.strip()}]({href})'  # Link
-                                                    list_item_text += formatted_text if formatted_text else text  # Use formatted or plain
-                                                else:
-                                                    list_item_text += text  # Append plain text
-
-                                if list_item_text.strip():  # Only add non-empty list items
-                                    result.append(f'{order + index}. {list_item_text.strip()}')  # Add ordered point
-                    elif block['type'] == 'hardBreak':
-                        result.append('\n')  # Manage hard breaks correctly
-    except (AttributeError, KeyError, TypeError) as e:
+        result = parser.adf.render_adf(description)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
         logging.error(f"Error parsing description: {e}")
         return "Error parsing description"
-        
-    return '\n'.join(result) if result else "No description found"
 
-def adf_table_to_markdown(block) -> str:
-    """
-    Convert a Jira ADF `table` block to GitHub-flavoured Markdown.
-    """
-    def cell_text(cell):
-        out = []
-        for paragraph in cell.get('content', []):
-            if paragraph['type'] == 'paragraph':
-                for item in paragraph.get('content', []):
-                    process_content(item, out)          # ← already exists
-        return ''.join(out).strip()
-
-    rows = [
-        [cell_text(c) for c in row.get('content', [])]
-        for row in block.get('content', [])
-    ]
-    if not rows:
-        return ''
+    return result if result else "No description found"
+
+# Attachment id in the media links of the comment HTML
+_ATTACHMENT_ID_RE = re.compile(r'/attachment/content/(\d+)')
 
-    header, *body = rows
-    md = [
-        '| ' + ' | '.join(header) + ' |',
-        '| ' + ' | '.join(['---'] * len(header)) + ' |',
-    ]
-    md += ['| ' + ' | '.join(r) + ' |' for r in body or [[]]]
-    return '\n'.join(md)
+def _element_text(element) -> str:
+    """The stripped text of an lxml element, like BeautifulSoup's ``get_text(strip=True)``."""
+    return ''.join(text.strip() for text in element.itertext())
 
-def html_table_to_markdown(table: BeautifulSoup) -> str:
+def html_table_to_markdown(table) -> str:
     """
-    Convert a BeautifulSoup <table> element into a GitHub-flavored markdown table.
+    Convert an lxml <table> element into a GitHub-flavored markdown table.
     """
     rows = []
-    for tr in table.find_all('tr'):
-        cells = tr.find_all(['th', 'td'])
-        rows.append([cell.get_text(strip=True) for cell in cells])
+    for tr in table.iter('tr'):
+        rows.append([_element_text(cell) for cell in tr.iter('th', 'td')])
 
     if not rows:
         return ''  # empty table
@@ -203,81 +62,100 @@ def html_table_to_markdown(table: BeautifulSoup) -> str:
     return '\n'.join(md_lines)
 
 
-def parse_jira_comments_xml(xml: str) -> pd.DataFrame:
-    """
-    Parse Jira comments from XML into a DataFrame, extracting text, media/file attachments, and tables.
-    """
-    root = ET.fromstring(xml)
+def _attachment_id(src: str) -> str | None:
+    m = _ATTACHMENT_ID_RE.search(src)
+    return m.group(1) if m else None
 
-    # Build a mapping of attachment ID to filename
-    attachments = {att.get('id'): att.get('name') for att in root.findall('.//attachments/attachment')}
+def _parse_comment_html(raw_html: str) -> dict:
+    """
+    Extract text, media and tables from the HTML of one comment in a single pass.
 
-    rows = []
-    for c in root.findall('.//comment'):
-        raw_html = html.unescape(c.text or '')
-        soup = BeautifulSoup(raw_html, 'html.parser')
-
-        # 1) Image attachments: <img src=...> and Jira thumbnail wrappers
-        img_srcs, img_names = [], []
-        # a) standard <img src> tags (skip icon images)
-        for img in soup.find_all('img', src=True):
-            src = img['src']
-            if '/images/icons/' in src:
+    The media names that have to come from the <attachments> of the issue are
+    left unresolved as (src, name, attachment id, fallback name), because the
+    attachments come after the comments in the XML.
+    """
+    root = lxml.html.fragment_fromstring(raw_html, create_parent='div')
+
+    images, wrappers, files, tables = [], [], [], []
+    for element in root.iter('img', 'a', 'table'):
+        tag = element.tag
+        if tag == 'img':
+            # a) standard <img src> tags (skip icon images)
+            src = element.get('src')
+            if src is None or '/images/icons/' in src:
                 continue
-            img_srcs.append(src)
-            m = re.search(r'/attachment/content/(\d+)', src)
-            img_names.append(attachments.get(m.group(1), 'NO_FILE_NAME') if m else 'NO_FILE_NAME')
-        # b) <a file-preview-type="image"> wrappers
-        for a in soup.find_all('a', attrs={'file-preview-type': 'image'}, href=True):
-            src = a['href']
-            if src in img_srcs:
+            images.append((src, None, _attachment_id(src), 'NO_FILE_NAME'))
+        elif tag == 'a':
+            href = element.get('href')
+            if href is None:
                 continue
-            img_srcs.append(src)
-            # pick a name from attributes or fallback
-            name = (
-                a.get('file-preview-title')
-                or a.get('data-attachment-name')
-                or a.get('title')
-                or attachments.get(re.search(r'/attachment/content/(\d+)', src).group(1), '')
-            )
-            img_names.append(name or 'NO_FILE_NAME')
-
-        # 2) File attachments
-        file_links, file_names = [], []
-        for a in soup.find_all('a', href=True):
-            m = re.search(r'/attachment/content/(\d+)', a['href'])
-            if m and a.get('data-attachment-type') == 'file':
-                fid = m.group(1)
-                file_links.append(a['href'])
-                file_names.append(
-                    a.get('data-attachment-name')
-                    or attachments.get(fid)
-                    or a.get_text(strip=True)
+            if element.get('file-preview-type') == 'image':
+                # b) <a file-preview-type="image"> thumbnail wrappers, named from attributes if possible
+                name = (
+                    element.get('file-preview-title')
+                    or element.get('data-attachment-name')
+                    or element.get('title')
                 )
+                wrappers.append((href, name, _attachment_id(href), 'NO_FILE_NAME'))
+            if element.get('data-attachment-type') == 'file':
+                # File attachments
+                fid = _attachment_id(href)
+                if fid:
+                    files.append((href, element.get('data-attachment-name'), fid, _element_text(element)))
+        else:
+            tables.append(html_table_to_markdown(element))
+
+    # Wrappers around an image that is already there are skipped
+    img_srcs = {src for src, *_ in images}
+    for wrapper in wrappers:
+        if wrapper[0] not in img_srcs:
+            img_srcs.add(wrapper[0])
+            images.append(wrapper)
+
+    return {
+        'text': ' '.join(text for text in (text.strip() for text in root.itertext()) if text),
+        'media': images + files,
+        'media_types': ['image'] * len(images) + ['file'] * len(files),
+        'tables': tables,
+    }
+
+
+def parse_jira_comments_xml(xml: str | bytes) -> dict[str, dict]:
+    """
+    Parse Jira comments from XML into a media record per comment id, extracting text, media/file attachments,
+    and tables.
+
+    The XML is streamed with iterparse and every comment is cleared once its
+    HTML has been parsed, so memory does not grow with the size of the issue.
+    """
+    if isinstance(xml, str):
+        xml = xml.encode('utf-8')
+
+    # Mapping of attachment ID to filename
+    attachments = {}
+    records = {}
+    for _, element in etree.iterparse(io.BytesIO(xml), events=('end',), tag=('comment', 'attachment'),
+                                      resolve_entities=False):
+        if element.tag == 'comment':
+            # The XML parser has already unescaped the comment HTML
+            record = _parse_comment_html(element.text or '')
+            record.update(author=element.get('author'), created=element.get('created'))
+            records[element.get('id')] = record
+        elif element.getparent() is not None and element.getparent().tag == 'attachments':
+            attachments[element.get('id')] = element.get('name')
+
+        # Drop the element and everything before it, only the comments parsed so far are kept
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+    for record in records.values():
+        media = record.pop('media')
+        record['media_srcs'] = [src for src, *_ in media]
+        record['media_names'] = [name or attachments.get(fid) or fallback for _, name, fid, fallback in media]
+
+    return records
 
-        # Combine media lists
-        media_srcs = img_srcs + file_links
-        media_names = img_names + file_names
-        media_types = ['image'] * len(img_srcs) + ['file'] * len(file_links)
-
-        # 3) Tables to markdown
-        tables_md = [html_table_to_markdown(tbl) for tbl in soup.find_all('table')]
-
-        rows.append({
-            'comment_id': c.get('id'),
-            'author': c.get('author'),
-            'created': c.get('created'),
-            'text': soup.get_text(' ', strip=True),
-            'media_srcs': media_srcs,
-            'media_names': media_names,
-            'media_types': media_types,
-            'tables': tables_md,
-        })
-
-    return pd.DataFrame(rows, columns=[
-        'comment_id', 'author', 'created', 'text',
-        'media_srcs', 'media_names', 'media_types', 'tables'
-    ])
 
 def parse_issue_attachments(attachments):
     if not attachments:
@@ -383,141 +261,7 @@ def filter_custom_fields(fields, custom_fields):
         return "\n ## Brugerdefineret felt\n" + result_string
 
 
-def _wrap(text: str, marker: str) -> str:
-    """
-    Wrap only the 'core' of the text in marker, preserving whitespace.
-    e.g. _wrap("  foo  ", "*") -> "  *foo*  "
-    """
-    _WS_RE = re.compile(r'^(\s*)(.*?)(\s*)$', re.DOTALL)
-
-    lead, core, trail = _WS_RE.match(text).groups()
-    if not core:
-        return text
-    return f"{lead}{marker}{core}{marker}{trail}"
-
-def process_content(item, output):
-    """Helper to convert a single ADF node to GitHub-flavored Markdown."""
-    t = item.get('type')
-
-    if t == 'mention':
-        # strip leading '@', preserve trailing space
-        name = item['attrs']['text'].lstrip('@')
-        output.append(f"{name} ") # not using "@" because it takes github users not part of the repo
-
-    elif t == 'text':
-        txt = item['text']
-        # strip any stray @ in plain text
-        txt = re.sub(r'@(\w+)', r'\1', txt)
-
-        if item.get('marks'):
-            # detect which marks are present
-            marks = {m['type']: m for m in item['marks']}
-            # apply in nesting order: bold → italic → underline → link
-            if 'strong' in marks:
-                txt = _wrap(txt, '**')
-            if 'em' in marks:
-                txt = _wrap(txt, '*')
-            if 'underline' in marks:
-                # HTML underline is fine for GFM
-                txt = f"<ins>{txt}</ins>"
-            if 'link' in marks:
-                href = marks['link']['attrs']['href']
-                txt = f"[{txt}]({href})"
-
-        output.append(txt)
-
-    elif t == 'hardBreak':
-        output.append('\n')
-
-    elif t == 'inlineCard':
-        url = item['attrs'].get('url', '')
-        output.append(f"[Link]({url})")
-
-    elif t == 'emoji':
-        output.append(item['attrs'].get('text', ''))
-    
-    elif t == 'mediaInline':
-        logging.info("type 'mediaInline' not implemented: %s", item)
-
-    else:
-        # you can expand for paragraphs, lists, etc.
-        raise NotImplementedError(f"Unsupported node type: {t}")
-
-
-def format_ordered_list(block, output, level=1):
-    """Format ordered lists with proper nesting and indentation."""
-    start_order = 1
-    if 'attrs' in block:
-        start_order = block['attrs'].get('order', 1)
-
-    for index, list_item in enumerate(block['content'], start=start_order):
-        # Create prefix with proper indentation
-        indent = "   " * (level - 1)  # 2 spaces per level
-        item_prefix = f"{indent}{index}. "
-
-        if 'content' not in list_item:
-            continue
-
-        # Process the content of this list item
-        for content_block in list_item['content']:
-            if content_block['type'] == 'paragraph':
-                paragraph_text = []
-                for item in content_block.get('content', []):
-                    if 'type' in item:
-                        if item['type'] == 'text':
-                            paragraph_text.append(item.get('text', ''))
-                        # Handle other types as needed
-
-                if paragraph_text:
-                    output.append(f"{item_prefix}{''.join(paragraph_text)}")
-
-            # Handle nested ordered lists
-            elif content_block['type'] == 'orderedList':
-                # Add the parent list item first if not already added
-                if not output or not output[-1].startswith(item_prefix):
-                    output.append(f"{item_prefix}")
-
-                # Process nested list with increased indentation level
-                format_ordered_list(content_block, output, level + 1)
-
-    # Add blank line after the list
-    if output and output[-1] != '':
-        output.append('')
-
-
-def format_bullet_list(block, output, level=1):
-    """Format bullet lists with proper nesting and indentation."""
-
-    for list_item in block['content']:
-        # Create prefix with proper indentation
-        indent = "  " * (level - 1)  # 2 spaces per level
-        item_prefix = f"{indent}* "
-
-        if 'content' not in list_item:
-            continue
-
-        # Process the content of this list item
-        for content_block in list_item['content']:
-            if content_block['type'] == 'paragraph':
-                paragraph_text = []
-                for item in content_block.get('content', []):
-                    if 'type' in item:
-                        process_content(item, paragraph_text)
-
-                if paragraph_text:
-                    output.append(f"{item_prefix}{''.join(paragraph_text)}")
-
-            # Handle nested bullet lists
-            elif content_block['type'] == 'bulletList':
-                # Add the parent list item first if not already added
-                if not output or not output[-1].startswith(item_prefix):
-                    output.append(f"{item_prefix}")
-
-                # Process nested list with increased indentation level
-                format_bullet_list(content_block, output, level + 1)
-
-
-def format_jira_comment(comment: dict, media_record: list[str]):
+def format_jira_comment(comment: dict, media_record: dict | None = None):
 
     JIRA_BASE_URL = os.getenv('JIRA_BASE_URL')
     
@@ -526,113 +270,27 @@ def format_jira_comment(comment: dict, media_record: list[str]):
 
     # Handle both direct and nested comment structures
     if 'body' in comment and 'content' in comment['body']:
-        content = comment['body']['content']
+        body = comment['body']
     elif 'content' in comment:
-        content = comment['content']
+        body = {'type': 'doc', 'content': comment['content']}
     else:
-        content = []  # Ensure content is defined even if empty
+        body = {'type': 'doc', 'content': []}  # Ensure content is defined even if empty
 
-    formatted_parts = []
-    idx = 0
+    # ADF only references media by id, the links come from the issue XML in document order
+    media_record = media_record or {}
+    media_links = []
+    for src, name in zip(media_record.get('media_srcs', ()), media_record.get('media_names', ())):
+        # Jira thumbnails → content endpoint
+        if 'thumbnail' in src:
+            src = src.replace('https://jar-cowi.atlassian.net/', '')
+            src = src.replace('thumbnail', 'content')
 
-    # img_names = df_media_comments.img_names # .iloc[media_number,:]
-    # img_srcs = df_media_comments.img_srcs
+        # Ensure absolute URL
+        if src.startswith('/'):
+            src = f'{JIRA_BASE_URL}{src}'
+
+        media_links.append(f'[{name}]({src})')
 
     href = comment.get('author', {}).get('self')
-    # Construct the header part with author
-    formatted_parts.append(f"[{author}]({href})\n")
-
-    # Process the content of the comment
-    for block in content:
-        if block['type'] == 'paragraph' and 'content' in block:
-            paragraph_text = []
-            for item in block['content']:
-                # Process each item within the paragraph
-                process_content(item, paragraph_text)
-            formatted_text = ''.join(paragraph_text).strip()
-            if formatted_text:
-                formatted_parts.append(formatted_text)
-        # IMAGE or FILE → treat them the same: drop a Markdown link right here
-        elif block['type'] in ('mediaSingle', 'mediaInline', 'mediaGroup'):
-            # `mediaGroup` can hold several <media> nodes
-            for _ in range(1 if block['type'] != 'mediaGroup' else len(block.get('content', []))):
-                if idx >= len(media_record['media_srcs']):
-                    break            # safety-net - nothing left to emit
-
-                src  = media_record['media_srcs'][idx]
-                name = media_record['media_names'][idx]
-
-                # Jira thumbnails → content endpoint
-                if 'thumbnail' in src:
-                    src = src.replace('https://jar-cowi.atlassian.net/', '')
-                    src = src.replace('thumbnail', 'content')
-
-                # Ensure absolute URL
-                if src.startswith('/'):
-                    src = f'{JIRA_BASE_URL}{src}'
-
-                formatted_parts.append(f'[{name}]({src})')
-                idx += 1
-
-        elif block['type'] == 'blockquote' and 'content' in block:
-            # Start blockquote with markdown indicator
-            blockquote_text = ["> "]
-
-            for paragraph in block['content']:
-                if paragraph['type'] == 'orderedList' and 'content' in paragraph:
-                    for index, list_item in enumerate(paragraph['content'], start=paragraph['attrs'].get('order', 1)):
-                        list_item_text = []
-                        # Use index for ordered number
-                        list_item_text.append(f"{index}. ")
-
-                        for item in list_item['content']:
-                            if 'content' in item:
-                                for par in item['content']:
-                                    process_content(par, list_item_text)
-
-                        formatted_text = ''.join(list_item_text).strip()
-                        if formatted_text:
-                            blockquote_text.append(formatted_text)
-                    # New line after list in blockquote
-                    blockquote_text.append('\n')
-
-                elif paragraph['type'] == 'paragraph' and 'content' in paragraph:
-                    for item in paragraph['content']:
-                        process_content(item, blockquote_text)
-                    # New line for each paragraph in blockquote
-                    blockquote_text.append('\n')
-
-            formatted_text = ''.join(blockquote_text).strip()
-            if formatted_text:
-                # Append the formatted blockquote
-                formatted_parts.append(formatted_text)
-            # Adding an empty line after the blockquote
-            formatted_parts.append('')
-
-        elif block['type'] == 'orderedList' and 'content' in block:
-            # Use helper function for ordered lists
-            format_ordered_list(block, formatted_parts)
-        elif block['type'] == 'bulletList' and 'content' in block:
-            format_bullet_list(block, formatted_parts)
-        elif block['type'] == 'table':
-            md = adf_table_to_markdown(block)
-            if md:
-                formatted_parts.append(md)
-        elif block['type'] == 'codeBlock':
-            # new handler for code blocks
-            language = block.get('attrs', {}).get('language', '')
-            # join all text nodes in content
-            code_lines = []
-            for item in block.get('content', []):
-                if item.get('type') == 'text':
-                    code_lines.append(item.get('text', ''))
-            code_text = '\n'.join(code_lines)
-            # emit a fenced code block with optional language
-            fence = f"```{language}" if language else "```"
-            formatted_parts.append(f"{fence}\n{code_text}\n```")
-
-    # for table_md in media_record.get('tables', []):
-    #     formatted_parts.append(table_md)
-    
-    # Final formatted output
-    return '\n'.join(formatted_parts)
\ No newline at end of file
+    # Construct the header part with author, followed by the comment itself
+    return f"[{author}]({href})\n\n" + parser.adf.render_adf(body, media_links)
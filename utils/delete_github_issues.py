@@ -1,20 +1,90 @@
-#!/bin/bash
-
-REPO="USER_NAME/REPO_NAME"         # Your repo
-FROM_ISSUE_NUMBER=10     # Starting issue number to delete from
-
-# Fetch up to 1000 issues, then loop
-gh issue list --repo "$REPO" --state all --limit 1000 --json number,title |
-  jq -c '.[]' | while read -r issue; do
-    ISSUE_NUMBER=$(echo "$issue" | jq '.number')
-    ISSUE_TITLE=$(echo "$issue" | jq -r '.title')
-
-    if (( ISSUE_NUMBER >= FROM_ISSUE_NUMBER )); then
-      echo "Deleting issue #$ISSUE_NUMBER: $ISSUE_TITLE"
-      if ! gh issue delete "$ISSUE_NUMBER" --repo "$REPO" --yes; then
-        echo "Failed to delete issue #$ISSUE_NUMBER" >> deletion_errors.log
-      fi
-    fi
-  done
-
-echo "Deletion complete for issues numbered $FROM_ISSUE_NUMBER and up."
+import argparse
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+import endpoint.github
+
+load_dotenv()
+
+
+def select_issues(issues, from_number=None, key=None):
+    """Return the issues numbered *from_number* and up and/or migrated from Jira project *key*."""
+    selected = []
+    for issue in issues:
+        if from_number is not None and issue['number'] < from_number:
+            continue
+        if key is not None:
+            jira_key = endpoint.github.jira_key_of(issue['title'])
+            if not jira_key or jira_key.rsplit('-', 1)[0].casefold() != key.casefold():
+                continue
+        selected.append(issue)
+    return selected
+
+
+def delete_github_issues(github_repo, github_token, from_number=None, key=None,
+                         dry_run=False, batch_size=25, max_workers=4, log_file='deleted_issues.log'):
+    """Delete the selected issues of *github_repo*, returns the number deleted.
+
+    The issues are listed with paginated GraphQL and deleted with batches of
+    aliased ``deleteIssue`` mutations, at most *max_workers* batches at a
+    time. Every deleted (or failed) issue is appended to *log_file*.
+    """
+    issues = select_issues(
+        endpoint.github.iter_github_issues(github_repo, github_token), from_number, key)
+    logging.info(f"{len(issues)} issues in {github_repo} selected for deletion")
+
+    if dry_run:
+        for issue in issues:
+            logging.info(f"Would delete issue #{issue['number']}: {issue['title']}")
+        return 0
+
+    batches = [issues[start:start + batch_size] for start in range(0, len(issues), batch_size)]
+    deleted = 0
+    with open(log_file, 'a', encoding='utf-8') as log, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda batch: endpoint.github.delete_issues(github_token, [issue['id'] for issue in batch]), batches)
+        for batch, deleted_ids in zip(batches, results):
+            deleted_ids = set(deleted_ids)
+            timestamp = datetime.now().isoformat(timespec='seconds')
+            for issue in batch:
+                status = 'deleted' if issue['id'] in deleted_ids else 'failed'
+                log.write(f"{timestamp}\t{github_repo}\t#{issue['number']}\t{status}\t{issue['title']}\n")
+            log.flush()
+            deleted += len(deleted_ids)
+            logging.info(f"Deleted {deleted} of {len(issues)} issues")
+
+    if deleted < len(issues):
+        logging.error(f"{len(issues) - deleted} issues could not be deleted, see {log_file}")
+    return deleted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Delete the issues of a GitHub repo, e.g. to clean up after a test migration.")
+    parser.add_argument('--repo', default=os.getenv('GH_REPO'), help="owner/name, defaults to GH_REPO")
+    parser.add_argument('--from-number', type=int, help="delete the issues with this number and up")
+    parser.add_argument('--key', help="delete the issues migrated from this Jira project, e.g. JAR for [JAR-123]")
+    parser.add_argument('--dry-run', action='store_true', help="only list the issues that would be deleted")
+    parser.add_argument('--batch-size', type=int, default=25, help="deletions per GraphQL mutation")
+    parser.add_argument('--max-workers', type=int, default=4, help="mutations running at the same time")
+    parser.add_argument('--log-file', default='deleted_issues.log', help="file the deleted issues are appended to")
+    args = parser.parse_args(argv)
+
+    if not args.repo:
+        parser.error("--repo or GH_REPO is required")
+    if args.from_number is None and args.key is None:
+        parser.error("--from-number and/or --key is required")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    delete_github_issues(
+        args.repo, os.getenv('GH_TOKEN'), from_number=args.from_number, key=args.key,
+        dry_run=args.dry_run, batch_size=args.batch_size, max_workers=args.max_workers, log_file=args.log_file)
+
+
+if __name__ == "__main__":
+    # python -m utils.delete_github_issues --from-number 10 --dry-run
+    main()
@@ -0,0 +1,234 @@
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Stages an issue goes through, in order
+STAGES = ['fetched', 'rendered', 'submitted', 'imported', 'in_project']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    issue_key     TEXT PRIMARY KEY,
+    updated       TEXT,
+    stage         TEXT NOT NULL,
+    import_id     INTEGER,
+    issue_number  INTEGER,
+    error         TEXT,
+    overflow_posted INTEGER,
+    description_hash TEXT,
+    fetched_at    REAL,
+    rendered_at   REAL,
+    submitted_at  REAL,
+    imported_at   REAL,
+    in_project_at REAL,
+    failed_at     REAL
+);
+CREATE INDEX IF NOT EXISTS issues_stage ON issues (stage);
+CREATE TABLE IF NOT EXISTS high_water_marks (
+    jql   TEXT PRIMARY KEY,
+    mark  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS labels (
+    name  TEXT PRIMARY KEY COLLATE NOCASE
+);
+"""
+
+# Columns added after the first release, journals created before get them on open
+_ADDED_COLUMNS = {
+    'overflow_posted': 'INTEGER',
+    'description_hash': 'TEXT',
+}
+
+
+def _parse_jira_datetime(value: str) -> datetime:
+    # Jira format: 2021-01-22T11:11:47.758+0100
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+
+def narrow_jql(jql: str, high_water_mark: str) -> str:
+    """Restrict *jql* to the issues updated at or after *high_water_mark*.
+
+    JQL only understands minutes and interprets dates in the timezone of the
+    Jira user, so the wall-clock part of the Jira timestamp is used as-is and
+    truncated to the minute. Issues from that minute are processed again,
+    which is harmless since they are updated rather than created.
+    """
+    since = _parse_jira_datetime(high_water_mark).strftime('%Y/%m/%d %H:%M')
+
+    # Keep a trailing ORDER BY outside of the parentheses
+    match = re.search(r'\s+order\s+by\s+.*$', jql, re.IGNORECASE | re.DOTALL)
+    if match:
+        return f'({jql[:match.start()]}) AND updated >= "{since}"{match.group(0)}'
+    return f'({jql}) AND updated >= "{since}"'
+
+
+class MigrationJournal:
+    """Crash-safe SQLite journal of the migration, one row per Jira key.
+
+    Every stage an issue reaches (fetched, rendered, import submitted with
+    its id, imported with its GitHub number, added to the project) is
+    committed right away, in WAL mode so the writes are cheap. After a crash
+    the next run knows which issues are done, which imports are still
+    pending on GitHub and which issues still have to be added to the
+    project. The journal also keeps the high-water mark per JQL for
+    incremental runs and the labels known to exist in GitHub. Safe to use
+    from several threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+        existing = {row['name'] for row in self.connection.execute('PRAGMA table_info(issues)')}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self.connection.execute(f'ALTER TABLE issues ADD COLUMN {column} {column_type}')
+        self.lock = threading.Lock()
+
+        # Tracked during the run to compute the next high-water mark
+        self._max_processed: str | None = None
+        self._min_failed: str | None = None
+
+    def _execute(self, sql: str, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def get(self, issue_key: str) -> sqlite3.Row | None:
+        rows = self._execute('SELECT * FROM issues WHERE issue_key = ?', (issue_key,))
+        return rows[0] if rows else None
+
+    def record_fetched(self, issue_key: str, updated: str) -> None:
+        self._execute(
+            'INSERT INTO issues (issue_key, updated, stage, fetched_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (issue_key) DO UPDATE SET fetched_at = excluded.fetched_at, '
+            # Issues that already reached GitHub keep their stage and last synced timestamp
+            'updated = CASE WHEN issue_number IS NULL THEN excluded.updated ELSE updated END, '
+            'stage = CASE WHEN stage IN (\'imported\', \'in_project\', \'submitted\') THEN stage ELSE excluded.stage END',
+            (issue_key, updated, 'fetched', time.time()))
+
+    def record_rendered(self, issue_key: str) -> None:
+        self._execute(
+            'UPDATE issues SET rendered_at = ?, '
+            # A resumed import keeps its stage, or the next run would submit it again
+            'stage = CASE WHEN stage IN (\'imported\', \'in_project\', \'submitted\') THEN stage ELSE ? END '
+            'WHERE issue_key = ?',
+            (time.time(), 'rendered', issue_key))
+
+    def record_submitted(self, issue_key: str, import_id: int) -> None:
+        self._execute('UPDATE issues SET stage = ?, import_id = ?, submitted_at = ? WHERE issue_key = ?',
+                      ('submitted', import_id, time.time(), issue_key))
+
+    def record_imported(self, issue_key: str, issue_number, updated: str, description_hash: str | None = None) -> None:
+        """Record that *issue_key* is GitHub issue *issue_number* as of *updated*.
+
+        *description_hash* identifies the description the issue carries, when known.
+        """
+        self._execute(
+            'UPDATE issues SET stage = CASE WHEN stage = \'in_project\' THEN stage ELSE ? END, '
+            'issue_number = ?, updated = ?, imported_at = ?, error = NULL, overflow_posted = NULL, '
+            'description_hash = COALESCE(?, description_hash) WHERE issue_key = ?',
+            ('imported', int(issue_number), updated, time.time(), description_hash, issue_key))
+        with self.lock:
+            if self._max_processed is None or _parse_jira_datetime(updated) > _parse_jira_datetime(self._max_processed):
+                self._max_processed = updated
+
+    def record_failed(self, issue_key: str, updated: str, error: str = '') -> None:
+        """Record that *issue_key* failed, so the next run picks it up again."""
+        logging.warning(f"Issue {issue_key} failed, it will be retried on the next run")
+        # Issues that could not even be loaded from Jira have no row yet
+        self._execute(
+            'INSERT INTO issues (issue_key, updated, stage, error, failed_at) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (issue_key) DO UPDATE SET '
+            'stage = CASE WHEN issue_number IS NULL THEN excluded.stage ELSE stage END, '
+            # A failed update may have changed part of the description on GitHub
+            'import_id = NULL, description_hash = NULL, error = excluded.error, failed_at = excluded.failed_at',
+            (issue_key, updated, 'fetched', error, time.time()))
+        with self.lock:
+            if self._min_failed is None or _parse_jira_datetime(updated) < _parse_jira_datetime(self._min_failed):
+                self._min_failed = updated
+
+    def record_incomplete(self, issue_key: str, issue_number, updated: str, posted: int, error: str = '') -> None:
+        """Record that GitHub issue *issue_number* only got *posted* of the comments added after its import.
+
+        *updated* is the last timestamp the issue is fully in sync with, the
+        next run adds the remaining comments.
+        """
+        logging.warning(f"Issue {issue_key} is missing comments, they will be added on the next run")
+        self._execute(
+            'UPDATE issues SET stage = CASE WHEN stage = \'in_project\' THEN stage ELSE ? END, '
+            'issue_number = ?, updated = ?, overflow_posted = ?, imported_at = ?, error = ?, failed_at = ? '
+            'WHERE issue_key = ?',
+            ('imported', int(issue_number), updated, posted, time.time(), error, time.time(), issue_key))
+        with self.lock:
+            if self._min_failed is None or _parse_jira_datetime(updated) < _parse_jira_datetime(self._min_failed):
+                self._min_failed = updated
+
+    def record_in_project(self, issue_numbers: list) -> None:
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                'UPDATE issues SET stage = ?, in_project_at = ? WHERE issue_number = ?',
+                [('in_project', now, int(number)) for number in issue_numbers])
+
+    def issue_numbers_not_in_project(self) -> list[int]:
+        rows = self._execute('SELECT issue_number FROM issues WHERE stage = ? ORDER BY imported_at', ('imported',))
+        return [row['issue_number'] for row in rows]
+
+    def provisioned_labels(self) -> set[str]:
+        return {row['name'].casefold() for row in self._execute('SELECT name FROM labels')}
+
+    def record_labels(self, names: list[str]) -> None:
+        with self.lock:
+            self.connection.executemany('INSERT OR IGNORE INTO labels (name) VALUES (?)', [(name,) for name in names])
+
+    def high_water_mark(self, jql: str) -> str | None:
+        rows = self._execute('SELECT mark FROM high_water_marks WHERE jql = ?', (jql,))
+        return rows[0]['mark'] if rows else None
+
+    def commit(self, jql: str) -> None:
+        """Advance the high-water mark of *jql* after a completed run.
+
+        Issues are not processed in ``updated`` order, so the mark is only
+        moved once the run is done. If anything failed it stops at the
+        oldest failure, so those issues are part of the next run.
+        """
+        new_mark = self._min_failed or self._max_processed
+        if new_mark is None:
+            return
+        current = self.high_water_mark(jql)
+        if current is None or _parse_jira_datetime(new_mark) > _parse_jira_datetime(current):
+            self._execute('INSERT OR REPLACE INTO high_water_marks (jql, mark) VALUES (?, ?)', (jql, new_mark))
+            logging.info(f"High-water mark is now {new_mark}")
+
+    def throughput(self) -> list[tuple[str, int, float]]:
+        """Return ``(stage, issues, issues per minute)`` for every stage."""
+        report = []
+        for stage in STAGES:
+            column = f'{stage}_at'
+            count, first, last = self._execute(
+                f'SELECT COUNT({column}), MIN({column}), MAX({column}) FROM issues')[0]
+            rate = count / ((last - first) / 60) if count > 1 and last > first else 0.0
+            report.append((stage, count, rate))
+        return report
+
+    def log_throughput(self) -> None:
+        for stage, count, rate in self.throughput():
+            logging.info(f"Journal: {count} issues {stage} ({rate:.1f}/min)")
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+if __name__ == "__main__":
+    # Print the throughput per stage of a journal: python -m utils.journal [path]
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    journal_path = sys.argv[1] if len(sys.argv) > 1 else os.getenv('MIGRATION_JOURNAL', 'migration_journal.sqlite3')
+    MigrationJournal(journal_path).log_throughput()